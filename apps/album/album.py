@@ -1,16 +1,23 @@
 import time
 import threading
-import pyautogui
+import queue
 import mss
 import cv2
 import os
 import numpy as np
 from datetime import datetime
 from gpiozero import Button
-from tkinter import Tk, Frame, Label, Canvas, Scrollbar, PhotoImage, NW, Toplevel, Button as TkButton, simpledialog
-from PIL import Image, ImageTk
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-from moviepy.editor import VideoFileClip
+from tkinter import Tk, Toplevel, simpledialog, messagebox, ttk
+from capture_pipeline import RecordingPipeline, mss_grabber
+from replay_buffer import ReplayBuffer
+from thumb_cache import ThumbnailCache
+from album_grid import AlbumGrid
+from capture_index import CaptureIndex, CapturePages
+from album_server import make_server
+from video_trim import trim
+from screenshot_writer import ScreenshotWriter
+from gestures import GestureEngine, WheelRunner
+from transcode_queue import TranscodeQueue
 
 # CONFIG
 FPS = 60.0
@@ -18,66 +25,132 @@ BUTTON_PIN = 17
 SAVE_DIR = "captures"
 FLASH_DURATION = 0.2
 HTTP_PORT = 8000
+HOLD_THRESHOLD = 0.5       # Seconds held before a press becomes a recording
+REPLAY_ENABLED = True      # Keep the last REPLAY_SECONDS in memory; double press saves them
+REPLAY_SECONDS = 30
+REPLAY_MAX_MB = 64
+DOUBLE_PRESS_WINDOW = 0.35 # Max gap between two quick presses of a double press
 
 os.makedirs(SAVE_DIR, exist_ok=True)
+thumbs = ThumbnailCache(SAVE_DIR)
+index = CaptureIndex(SAVE_DIR)
+proxies = TranscodeQueue(SAVE_DIR)  # Phone-friendly H.264 copies of recordings, built in the background
 
 def timestamp_name(ext):
     return datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ext
 
+def capture_saved(path):
+    """Bring the thumbnail cache and capture index up to date with a new or changed file."""
+    thumbs.submit(path)
+    index.add(path)
+    proxies.submit(path)  # Ignores screenshots
+
+# Flash: a plain white frame, built once; shown on its own thread so callers never wait
+flash_frame = None
+flash_lock = threading.Lock()
+
+def _flash():
+    global flash_frame
+    if not flash_lock.acquire(blocking=False):
+        return  # A flash is already on screen
+    try:
+        if flash_frame is None:
+            with mss.mss() as sct:
+                monitor = sct.monitors[0]
+            flash_frame = np.full((monitor["height"], monitor["width"], 3), 255, np.uint8)
+        cv2.imshow("Capture Flash", flash_frame)
+        cv2.waitKey(int(FLASH_DURATION*1000))
+        cv2.destroyWindow("Capture Flash")
+    finally:
+        flash_lock.release()
+
 def show_flash():
-    screen = pyautogui.screenshot()
-    img = np.array(screen)
-    white = np.ones_like(img) * 255
-    overlay = cv2.addWeighted(img, 0.0, white, 1.0, 0)
-    cv2.imshow("Capture Flash", overlay)
-    cv2.waitKey(int(FLASH_DURATION*1000))
-    cv2.destroyWindow("Capture Flash")
+    threading.Thread(target=_flash, daemon=True).start()
+
+# Screenshots: grab here, PNG encode + atomic rename on the writer thread
+grabbers = threading.local()  # mss handles are bound to the thread that opened them
+
+def screenshot_saved(path):
+    capture_saved(path)
+    print(f"[+] Screenshot saved: {path}")
+
+screenshot_writer = ScreenshotWriter(SAVE_DIR, on_saved=screenshot_saved)
 
 def safe_save_screenshot():
-    temp_file = os.path.join(SAVE_DIR, "temp_screenshot.png")
-    final_file = os.path.join(SAVE_DIR, timestamp_name(".png"))
-    pyautogui.screenshot().save(temp_file)
-    os.rename(temp_file, final_file)
+    sct = getattr(grabbers, "sct", None)
+    if sct is None:
+        sct = grabbers.sct = mss.mss()
+    shot = sct.grab(sct.monitors[0])  # shot.raw is a fresh copy of the pixels
+    screenshot_writer.submit(shot.raw, shot.width, shot.height, os.path.join(SAVE_DIR, timestamp_name(".png")))
     show_flash()
-    print(f"[+] Screenshot saved: {final_file}")
 
 def safe_save_recording(stop_event):
     temp_file = os.path.join(SAVE_DIR, "temp_recording.mp4")
     final_file = os.path.join(SAVE_DIR, timestamp_name(".mp4"))
     with mss.mss() as sct:
         monitor = sct.monitors[0]
-        width, height = monitor["width"], monitor["height"]
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out = cv2.VideoWriter(temp_file, fourcc, FPS, (width, height))
-        last_frame_time = time.time()
-        while not stop_event.is_set():
-            now = time.time()
-            if now - last_frame_time >= 1/FPS:
-                frame = cv2.cvtColor(np.array(sct.grab(monitor)), cv2.COLOR_BGRA2BGR)
-                out.write(frame)
-                last_frame_time = now
-        out.release()
+    width, height = monitor["width"], monitor["height"]
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    out = cv2.VideoWriter(temp_file, fourcc, FPS, (width, height))
+    # Grabbing and encoding run on their own threads; this one just waits
+    pipeline = RecordingPipeline(mss_grabber(mss.mss, monitor), out, width, height, FPS).start()
+    stop_event.wait()
+    stats = pipeline.stop()
     os.rename(temp_file, final_file)
-    print(f"[+] Recording saved: {final_file}")
-
-def button_pressed():
-    press_start = time.time()
-    stop_event = threading.Event()
-    recording_thread = None
-    while button.is_pressed:
-        if time.time() - press_start > 0.5 and recording_thread is None:
-            print("[*] Starting recording... hold button to keep recording")
-            recording_thread = threading.Thread(target=safe_save_recording, args=(stop_event,), daemon=True)
-            recording_thread.start()
-        time.sleep(0.01)
-    hold_time = time.time() - press_start
-    if hold_time < 0.5:
-        safe_save_screenshot()
-    else:
-        stop_event.set()
-        if recording_thread:
-            recording_thread.join()
+    capture_saved(final_file)
+    print(f"[+] Recording saved: {final_file} ({stats['encoded']} frames, {stats['fps']:.1f} FPS, "
+          f"{stats['dropped_full'] + stats['missed_ticks']} dropped)")
+
+# Instant replay
+replay_buffer = None
+
+def start_replay():
+    global replay_buffer
+    with mss.mss() as sct:
+        monitor = sct.monitors[0]
+    width, height = monitor["width"], monitor["height"]
+    replay_buffer = ReplayBuffer(width, height, FPS, REPLAY_SECONDS, REPLAY_MAX_MB)
+    RecordingPipeline(mss_grabber(mss.mss, monitor), replay_buffer, width, height, FPS).start()
+    print(f"[*] Instant replay on: last {REPLAY_SECONDS}s kept (max {REPLAY_MAX_MB} MB)")
+
+replay_save_lock = threading.Lock()  # Double presses can overlap; saves run one at a time
+
+def save_replay():
+    if replay_buffer is None:
+        return
+    with replay_save_lock:
+        final_file = os.path.join(SAVE_DIR, timestamp_name("_replay.mp4"))
+        temp_file = os.path.join(SAVE_DIR, "temp_" + os.path.basename(final_file))
+        if replay_buffer.save(temp_file):
+            os.rename(temp_file, final_file)
+            capture_saved(final_file)
+            show_flash()
+            print(f"[+] Replay saved: {final_file}")
+
+def save_replay_async():
+    threading.Thread(target=save_replay, daemon=True).start()
+
+# Recording, started and stopped by the gesture engine
+recording_stop = None
+recording_thread = None
+
+def start_recording():
+    global recording_stop, recording_thread
+    print("[*] Starting recording... hold button to keep recording")
+    recording_stop = threading.Event()
+    recording_thread = threading.Thread(target=safe_save_recording, args=(recording_stop,), daemon=True)
+    recording_thread.start()
+
+def stop_recording():
+    stop_event, thread = recording_stop, recording_thread
+    if stop_event is None:
+        return
+    stop_event.set()
+
+    def finish():
+        thread.join()
         show_flash()
+    threading.Thread(target=finish, daemon=True).start()
 
 # Video editing
 def trim_video(path):
@@ -86,12 +159,43 @@ def trim_video(path):
     if start is None or end is None or start >= end:
         print("[!] Invalid times")
         return
-    clip = VideoFileClip(path)
-    new_clip = clip.subclip(start, end)
-    temp_file = path + ".temp.mp4"
-    new_clip.write_videofile(temp_file, codec="libx264")
-    os.replace(temp_file, path)
-    print(f"[+] Video trimmed: {path}")
+    accurate = messagebox.askyesno("Trim Video", "Cut on the exact frames?\n(No cuts on the nearest keyframes, which is instant)")
+    name = os.path.basename(path)
+    progress_win = Toplevel()
+    progress_win.title(f"Trimming {name}")
+    bar = ttk.Progressbar(progress_win, length=300, maximum=1.0)
+    bar.pack(padx=10, pady=10)
+    updates = queue.Queue()  # Progress fractions, then ("done", span) or ("error", exception)
+
+    def work():
+        temp_file = os.path.join(SAVE_DIR, "temp_trim_" + name)
+        try:
+            kept = trim(path, temp_file, start, end, accurate, progress=updates.put)
+            os.replace(temp_file, path)  # Only reached once trim() produced frames
+            capture_saved(path)
+            updates.put(("done", kept))
+        except Exception as e:
+            updates.put(("error", e))
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def poll():
+        while not updates.empty():
+            update = updates.get()
+            if isinstance(update, tuple):
+                progress_win.destroy()
+                if update[0] == "done":
+                    print(f"[+] Video trimmed: {path} ({update[1][0]:.2f}s - {update[1][1]:.2f}s kept)")
+                else:
+                    print(f"[!] Trim failed for {path}: {update[1]}")
+                return
+            bar["value"] = update
+        progress_win.after(50, poll)
+
+    # The worker never touches Tk; poll() runs on the Tk thread
+    threading.Thread(target=work, daemon=True).start()
+    poll()
 
 def play_video(path):
     cap = cv2.VideoCapture(path)
@@ -105,73 +209,55 @@ def play_video(path):
     cap.release()
     cv2.destroyWindow(f"Playing {os.path.basename(path)}")
 
-# Album GUI with video thumbnails
+# Album GUI: virtualised grid, thumbnails load as rows scroll into view
 def open_album():
     album_win = Toplevel()
     album_win.title("Capture Album")
-    canvas = Canvas(album_win)
-    scrollbar = Scrollbar(album_win, orient="vertical", command=canvas.yview)
-    scrollable_frame = Frame(canvas)
-    scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-    canvas.create_window((0,0), window=scrollable_frame, anchor=NW)
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    files = sorted(os.listdir(SAVE_DIR), reverse=True)
-    images = []
-    row, col = 0, 0
-    for f in files:
-        path = os.path.join(SAVE_DIR, f)
-        if f.lower().endswith((".png",".jpg")):
-            img = Image.open(path)
-            img.thumbnail((200,200))
-            photo = ImageTk.PhotoImage(img)
-            images.append(photo)
-            lbl = Label(scrollable_frame, image=photo)
-            lbl.grid(row=row, column=col, padx=5, pady=5)
-            col += 1
-            if col > 3:
-                col = 0
-                row += 1
-        elif f.lower().endswith(".mp4"):
-            # Extract first frame for thumbnail
-            cap = cv2.VideoCapture(path)
-            ret, frame = cap.read()
-            cap.release()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame)
-                img.thumbnail((200,200))
-                photo = ImageTk.PhotoImage(img)
-                images.append(photo)
-                lbl = Label(scrollable_frame, image=photo, text=f, compound="top")
-                lbl.grid(row=row, column=col, padx=5, pady=5)
-                TkButton(scrollable_frame, text="Play", command=lambda p=path: threading.Thread(target=play_video, args=(p,), daemon=True).start()).grid(row=row+1, column=col)
-                TkButton(scrollable_frame, text="Trim", command=lambda p=path: trim_video(p)).grid(row=row+2, column=col)
-                col += 1
-                if col > 3:
-                    col = 0
-                    row += 3
-
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
+    AlbumGrid(album_win, thumbs, CapturePages(index),
+              on_play=lambda p: threading.Thread(target=play_video, args=(p,), daemon=True).start(),
+              on_trim=trim_video)
 
 # HTTP server for smartphone
 def start_http_server():
-    os.chdir(SAVE_DIR)
-    server = HTTPServer(("0.0.0.0", HTTP_PORT), SimpleHTTPRequestHandler)
+    server = make_server(SAVE_DIR, thumbs, index, HTTP_PORT, proxies=proxies)
     print(f"[*] HTTP server running on port {HTTP_PORT}. Access from smartphone: http://<PC_IP>:{HTTP_PORT}/")
     server.serve_forever()
 
 # Setup
 button = Button(BUTTON_PIN)
-button.when_pressed = button_pressed
 
-print("[*] Custom button: quick press = screenshot, hold = recording until release")
+if REPLAY_ENABLED:
+    start_replay()
+
+# Edges and timers only: the button callbacks return straight away
+gestures = GestureEngine(WheelRunner(), on_screenshot=safe_save_screenshot,
+                         on_record_start=start_recording, on_record_stop=stop_recording,
+                         on_save_replay=save_replay_async, hold_time=HOLD_THRESHOLD,
+                         double_window=DOUBLE_PRESS_WINDOW, double_press=replay_buffer is not None,
+                         is_pressed=lambda: button.is_pressed)
+button.when_pressed = gestures.pressed
+button.when_released = gestures.released
+
+def refresh_album_cache():
+    updated, deleted = index.sync()
+    removed = thumbs.prune() + proxies.prune()
+    print(f"[*] Capture index: {index.count()} captures ({updated} updated, {deleted} removed), "
+          f"{removed} stale thumbnails/proxies pruned")
+    thumbs.warm()
+    proxies.warm()
+
+threading.Thread(target=refresh_album_cache, daemon=True).start()
+
+print("[*] Custom button: quick press = screenshot, hold = recording until release, "
+      "double press = save replay, tap then hold = save replay and record")
 print("[*] Press Enter to open album GUI")
 
 def album_listener():
     while True:
         input()
+        # Captures may have been added or deleted by hand since the last look
+        index.sync()
+        thumbs.prune()
         open_album()
 
 threading.Thread(target=album_listener, daemon=True).start()
@@ -0,0 +1,123 @@
+# album_grid.py
+# Virtualised thumbnail grid for the capture album.
+#
+# Only the rows in view (plus PREFETCH_ROWS above and below) have canvas
+# items, buttons and PhotoImages; everything else is just an entry in the
+# file list. Thumbnails are loaded on the ThumbnailCache worker pool and
+# handed back to the Tk thread through a queue polled with after(), because
+# Tk objects may only be touched from the thread that owns the interpreter.
+# Cells that scroll out of range are destroyed, releasing their PhotoImage.
+import os
+import queue
+from tkinter import Canvas, Scrollbar, Button as TkButton, TclError, NW
+
+from PIL import ImageTk
+
+from thumb_cache import VIDEO_EXTS
+
+COLUMNS = 4
+CELL_WIDTH = 220
+CELL_HEIGHT = 270
+PREFETCH_ROWS = 2
+POLL_MS = 30
+
+class AlbumGrid:
+    def __init__(self, master, thumbs, files, on_play, on_trim, columns=COLUMNS):
+        """files is a sequence of capture paths (e.g. CapturePages); on_play/on_trim take a path."""
+        self.thumbs = thumbs
+        self.files = files
+        self.on_play = on_play
+        self.on_trim = on_trim
+        self.columns = columns
+        self.cells = {}      # index -> {"items": [...], "widgets": [...], "photo": PhotoImage}
+        self.loaded = queue.Queue()  # (index, path, PIL image) from worker threads
+
+        rows = (len(files) + columns - 1) // columns
+        self.canvas = Canvas(master, width=columns * CELL_WIDTH, height=3 * CELL_HEIGHT,
+                             scrollregion=(0, 0, columns * CELL_WIDTH, rows * CELL_HEIGHT))
+        self.scrollbar = Scrollbar(master, orient="vertical", command=self._yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+        self.canvas.bind("<MouseWheel>", lambda e: self._scroll(-1 if e.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda e: self._scroll(-1))
+        self.canvas.bind("<Button-5>", lambda e: self._scroll(1))
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.after(POLL_MS, self._poll)
+
+    # --- scrolling ---
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def _scroll(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self.refresh()
+
+    def visible_range(self):
+        """Indices of files whose cells should exist right now."""
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(int(top // CELL_HEIGHT) - PREFETCH_ROWS, 0)
+        last_row = int(bottom // CELL_HEIGHT) + PREFETCH_ROWS
+        return range(first_row * self.columns, min((last_row + 1) * self.columns, len(self.files)))
+
+    def refresh(self):
+        wanted = self.visible_range()
+        for index in [i for i in self.cells if i not in wanted]:
+            self._destroy_cell(index)
+        for index in wanted:
+            if index not in self.cells:
+                self._create_cell(index)
+
+    # --- cells ---
+    def _create_cell(self, index):
+        try:
+            path = self.files[index]
+        except IndexError:
+            return  # Capture deleted since the grid opened
+        row, col = divmod(index, self.columns)
+        x, y = col * CELL_WIDTH + 10, row * CELL_HEIGHT + 5
+        cell = {"items": [], "widgets": [], "photo": None, "pos": (x, y)}
+        cell["items"].append(self.canvas.create_rectangle(x, y, x + 200, y + 200, outline="gray"))
+        cell["items"].append(self.canvas.create_text(x + 100, y + 212, text=os.path.basename(path),
+                                                     width=CELL_WIDTH - 10))
+        if path.lower().endswith(VIDEO_EXTS):
+            play = TkButton(self.canvas, text="Play", command=lambda: self.on_play(path))
+            trim = TkButton(self.canvas, text="Trim", command=lambda: self.on_trim(path))
+            cell["widgets"] += [play, trim]
+            cell["items"].append(self.canvas.create_window(x + 50, y + 240, window=play))
+            cell["items"].append(self.canvas.create_window(x + 150, y + 240, window=trim))
+        self.cells[index] = cell
+        # Decoding happens on the cache's worker pool; only the result crosses back
+        future = self.thumbs.submit(path)
+        future.add_done_callback(lambda f: self.loaded.put(
+            (index, path, None if f.exception() else f.result())))
+
+    def _destroy_cell(self, index):
+        cell = self.cells.pop(index)
+        for item in cell["items"]:
+            self.canvas.delete(item)
+        for widget in cell["widgets"]:
+            widget.destroy()
+        cell["photo"] = None  # Last reference: Tk frees the image
+
+    def _poll(self):
+        try:
+            while True:
+                index, path, img = self.loaded.get_nowait()
+                cell = self.cells.get(index)
+                # Skip results for cells that scrolled away before the load finished
+                if cell is None or img is None or cell["photo"] is not None:
+                    continue
+                x, y = cell["pos"]
+                cell["photo"] = ImageTk.PhotoImage(img)
+                cell["items"].append(self.canvas.create_image(x + (200 - img.width) // 2,
+                                                              y + (200 - img.height) // 2,
+                                                              image=cell["photo"], anchor=NW))
+        except queue.Empty:
+            pass
+        try:
+            self.canvas.after(POLL_MS, self._poll)
+        except TclError:
+            pass  # Window closed
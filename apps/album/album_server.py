@@ -0,0 +1,222 @@
+# album_server.py
+# HTTP server for browsing and downloading captures from a phone.
+#
+#   GET /                     simple HTML gallery (first page of the index)
+#   GET /api/captures         JSON page of the capture index
+#                             ?kind=image|video &sort=created|size|duration|name
+#                             &order=asc|desc &offset=N &limit=N
+#   GET /thumbs/<name>        cached JPEG thumbnail
+#   GET /media/<name>         the capture (also /<name> for old links); videos
+#                             come as their H.264 proxy once one exists,
+#                             ?original=1 always sends the original file
+#
+# Each request runs on its own thread, so one long download no longer stalls
+# everyone else. Media supports single byte ranges (206) so phones can seek
+# in videos, and file bodies go out with socket.sendfile (zero-copy where the
+# OS supports it). Every response carries an ETag and honours If-None-Match.
+import hashlib
+import html
+import json
+import os
+import re
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+
+from capture_index import PAGE_SIZE, SORT_COLUMNS
+from thumb_cache import is_capture
+
+MAX_PAGE = 500
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".mp4": "video/mp4"}
+
+def file_etag(st):
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, None to send it all, or False if unsatisfiable."""
+    m = RANGE_RE.match(header.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None  # Malformed or multi-range: the whole file is a valid answer
+    if not m.group(1):  # Suffix range: the last N bytes
+        length = int(m.group(2))
+        return (max(size - length, 0), size - 1) if length and size else False
+    start = int(m.group(1))
+    if m.group(2) and int(m.group(2)) < start:
+        return None  # Last byte before the first: invalid, so ignored (RFC 9110 14.1.1)
+    if start >= size:
+        return False
+    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    return start, end
+
+class AlbumHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive: a gallery page fetches many thumbnails
+    disable_nagle_algorithm = True  # Headers and body go out in separate sends
+    save_dir = None
+    thumbs = None
+    index = None
+    proxies = None  # TranscodeQueue, optional
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def handle_request(self, send_body):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        try:
+            if path == "/":
+                self.send_gallery(send_body)
+            elif path == "/api/captures":
+                self.send_listing(parse_qs(url.query), send_body)
+            elif path.startswith("/thumbs/"):
+                self.send_thumbnail(path[len("/thumbs/"):], send_body)
+            elif path.startswith("/media/"):
+                self.send_media(path[len("/media/"):], parse_qs(url.query), send_body)
+            else:
+                self.send_media(path[1:], parse_qs(url.query), send_body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # Client went away mid-download
+
+    def log_message(self, *args):
+        pass
+
+    # --- helpers ---
+    def capture_path(self, name):
+        """Absolute path of a capture, or None if name is not a plain capture file name."""
+        if name != os.path.basename(name) or not is_capture(name):
+            return None
+        path = os.path.join(self.save_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def not_modified(self, etag):
+        match = self.headers.get("If-None-Match")
+        if match and (match.strip() == "*" or etag in [t.strip() for t in match.split(",")]):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return True
+        return False
+
+    def send_bytes(self, body, content_type, send_body, etag=None, cache="no-cache"):
+        etag = etag or '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        if self.not_modified(etag):
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cache)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_file(self, path, content_type, send_body, cache="no-cache", ranges=False):
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(404)
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            etag = file_etag(st)
+            if self.not_modified(etag):
+                return
+            start, end = 0, st.st_size - 1
+            byte_range = None
+            if ranges and "Range" in self.headers:
+                if_range = self.headers.get("If-Range")
+                if if_range is None or if_range.strip() == etag:
+                    byte_range = parse_range(self.headers["Range"], st.st_size)
+            if byte_range is False:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{st.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if byte_range:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache)
+            if ranges:
+                self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+            if send_body and end >= start:
+                self.wfile.flush()
+                self.connection.sendfile(f, start, end - start + 1)
+
+    # --- routes ---
+    def send_media(self, name, query, send_body):
+        path = self.capture_path(name)
+        if path is None:
+            self.send_error(404)
+            return
+        if self.proxies is not None and query.get("original", ["0"])[0] != "1":
+            path = self.proxies.proxy_for(path) or path
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+        self.send_file(path, content_type, send_body, ranges=True)
+
+    def send_thumbnail(self, name, send_body):
+        path = self.capture_path(name)
+        try:
+            thumb = self.thumbs.thumb_path(path) if path else None
+        except OSError:
+            thumb = None
+        if thumb is None or (not os.path.exists(thumb) and self.thumbs.submit(path).result() is None):
+            self.send_error(404)
+            return
+        # The thumbnail name changes whenever the capture does, so it can be cached for good
+        self.send_file(thumb, "image/jpeg", send_body, cache="max-age=31536000, immutable")
+
+    def listing(self, query):
+        def arg(name, default):
+            return query.get(name, [default])[0]
+        kind = arg("kind", None)
+        if kind not in (None, "image", "video"):
+            raise ValueError("kind must be image or video")
+        sort = arg("sort", "created")
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+        offset = max(int(arg("offset", 0)), 0)
+        limit = min(max(int(arg("limit", PAGE_SIZE)), 1), MAX_PAGE)
+        items = self.index.query(kind, sort, arg("order", "desc") != "asc", offset, limit)
+        for item in items:
+            item["url"] = "/media/" + quote(item["name"])
+            item["original_url"] = item["url"] + "?original=1"
+            # Versioned so the immutable thumbnail is refetched after a trim
+            item["thumb"] = f"/thumbs/{quote(item['name'])}?v={item['mtime_ns']}"
+        return {"total": self.index.count(kind), "offset": offset, "limit": limit, "items": items}
+
+    def send_listing(self, query, send_body):
+        try:
+            page = self.listing(query)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        self.send_bytes(json.dumps(page).encode(), "application/json", send_body)
+
+    def send_gallery(self, send_body):
+        page = self.listing({})
+        cells = "".join(
+            f'<a href="{html.escape(item["url"])}"><img src="{html.escape(item["thumb"])}" '
+            f'loading="lazy" title="{html.escape(item["name"])}"></a>\n'
+            for item in page["items"])
+        body = (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Captures</title>"
+                f"<meta name='viewport' content='width=device-width'></head><body>"
+                f"<p>{page['total']} captures</p>\n{cells}</body></html>").encode()
+        self.send_bytes(body, "text/html; charset=utf-8", send_body)
+
+def make_server(save_dir, thumbs, index, port, host="0.0.0.0", proxies=None):
+    handler = type("BoundAlbumHandler", (AlbumHandler,),
+                   {"save_dir": save_dir, "thumbs": thumbs, "index": index, "proxies": proxies})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,49 @@
+# capture_bench.py
+# Achieved-FPS benchmark for RecordingPipeline with a synthetic source.
+# The source fakes a screen grab (a memcpy of a full frame) and the writer
+# fakes an encoder with a fixed cost per frame, so the pipeline can be
+# measured on a machine without a display or GPIO.
+# Usage: python capture_bench.py [seconds] [fps] [width] [height] [encode_ms]
+import sys
+import time
+
+import numpy as np
+
+from capture_pipeline import RecordingPipeline
+
+class SyntheticWriter:
+    def __init__(self, encode_ms):
+        self.encode_s = encode_ms / 1000.0
+        self.frames = 0
+
+    def write(self, frame):
+        end = time.perf_counter() + self.encode_s
+        frame.sum(dtype=np.uint64)  # Touch the pixels like an encoder would
+        while time.perf_counter() < end:
+            time.sleep(0)
+        self.frames += 1
+
+    def release(self):
+        pass
+
+def synthetic_grabber(width, height):
+    def make_grabber():
+        source = np.random.default_rng(0).integers(0, 255, (height, width, 4), np.uint8)
+
+        def grab_into(buffer):
+            np.copyto(buffer, source)
+        return grab_into
+    return make_grabber
+
+def run(seconds=5.0, fps=60.0, width=1920, height=1080, encode_ms=8.0):
+    pipeline = RecordingPipeline(synthetic_grabber(width, height), SyntheticWriter(encode_ms),
+                                 width, height, fps).start()
+    time.sleep(seconds)
+    stats = pipeline.stop()
+    print(f"target {fps:.0f} FPS at {width}x{height}, synthetic encode {encode_ms} ms/frame")
+    for key, value in stats.items():
+        print(f"  {key:<13} {value:.2f}" if isinstance(value, float) else f"  {key:<13} {value}")
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:]]
+    run(*args[:2], *(int(a) for a in args[2:4]), *args[4:5])
@@ -0,0 +1,164 @@
+# capture_index.py
+# SQLite index of the captures in SAVE_DIR.
+#
+# One row per capture with its kind, capture time, dimensions, duration and
+# size, so the album GUI and the HTTP server can sort, filter and page
+# without listing the directory or opening media files. Saves add their row
+# directly (add()); sync() reconciles with the directory by comparing
+# mtime/size, so only new or changed files are probed.
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import cv2
+from PIL import Image
+
+from thumb_cache import VIDEO_EXTS, is_capture
+
+INDEX_FILE = ".index.sqlite3"
+PAGE_SIZE = 100
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"  # Prefix of every capture name, see album.timestamp_name
+SORT_COLUMNS = ("created", "size", "duration", "name")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    name     TEXT PRIMARY KEY,
+    kind     TEXT NOT NULL,      -- "image" or "video"
+    created  REAL NOT NULL,      -- Unix time the capture was taken
+    width    INTEGER,
+    height   INTEGER,
+    duration REAL,               -- Seconds; NULL for images
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captures_created ON captures (kind, created);
+"""
+
+def probe(path):
+    """Return the metadata row for the capture at path (without the name)."""
+    st = os.stat(path)
+    name = os.path.basename(path)
+    try:
+        created = datetime.strptime(name[:19], TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        created = st.st_mtime
+    width = height = duration = None
+    if name.lower().endswith(VIDEO_EXTS):
+        kind = "video"
+        cap = cv2.VideoCapture(path)
+        if cap.isOpened():
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+            duration = frames / fps if fps > 0 else None
+        cap.release()
+    else:
+        kind = "image"
+        try:
+            with Image.open(path) as img:  # Reads the header only
+                width, height = img.size
+        except OSError:
+            pass
+    return {"kind": kind, "created": created, "width": width, "height": height,
+            "duration": duration, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+class CaptureIndex:
+    def __init__(self, save_dir, path=None):
+        self.save_dir = save_dir
+        self.db = sqlite3.connect(path or os.path.join(save_dir, INDEX_FILE), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.Lock()  # One connection shared by the GUI, server and savers
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+
+    # --- updates ---
+    def add(self, path):
+        """Index (or re-index) the capture at path; returns False if it cannot be read."""
+        try:
+            row = probe(path)
+        except OSError:
+            return False
+        row["name"] = os.path.basename(path)
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO captures (name, kind, created, width, height, duration, size, mtime_ns) "
+                "VALUES (:name, :kind, :created, :width, :height, :duration, :size, :mtime_ns)", row)
+        return True
+
+    def remove(self, name):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM captures WHERE name = ?", (name,))
+
+    def sync(self):
+        """Bring the index in line with SAVE_DIR; returns (added or updated, removed)."""
+        with self.lock:
+            known = {r["name"]: (r["mtime_ns"], r["size"])
+                     for r in self.db.execute("SELECT name, mtime_ns, size FROM captures")}
+        updated = 0
+        for name in os.listdir(self.save_dir):
+            if not is_capture(name):
+                continue
+            path = os.path.join(self.save_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if known.pop(name, None) != (st.st_mtime_ns, st.st_size):
+                updated += self.add(path)
+        for name in known:  # Left over: no longer on disk
+            self.remove(name)
+        return updated, len(known)
+
+    # --- queries ---
+    def query(self, kind=None, sort="created", descending=True, offset=0, limit=PAGE_SIZE):
+        """One page of captures as dicts; kind is None, "image" or "video"."""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"cannot sort by {sort!r}")
+        sql = "SELECT * FROM captures"
+        args = []
+        if kind is not None:
+            sql += " WHERE kind = ?"
+            args.append(kind)
+        sql += f" ORDER BY {sort} {'DESC' if descending else 'ASC'}, name DESC LIMIT ? OFFSET ?"
+        args += [limit, offset]
+        with self.lock:
+            return [dict(r) for r in self.db.execute(sql, args)]
+
+    def count(self, kind=None):
+        with self.lock:
+            if kind is None:
+                return self.db.execute("SELECT COUNT(*) FROM captures").fetchone()[0]
+            return self.db.execute("SELECT COUNT(*) FROM captures WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def get(self, name):
+        with self.lock:
+            row = self.db.execute("SELECT * FROM captures WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+class CapturePages:
+    """Read-only sequence of capture paths backed by paged index queries."""
+
+    def __init__(self, index, kind=None, sort="created", descending=True, page_size=PAGE_SIZE):
+        self.index = index
+        self.query = {"kind": kind, "sort": sort, "descending": descending}
+        self.page_size = page_size
+        self.length = index.count(kind)  # Snapshot: the view does not change while open
+        self.pages = {}
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        page, slot = divmod(i, self.page_size)
+        rows = self.pages.get(page)
+        if rows is None:
+            rows = self.pages[page] = self.index.query(offset=page * self.page_size,
+                                                       limit=self.page_size, **self.query)
+        if slot >= len(rows):
+            raise IndexError(i)  # Rows deleted since the snapshot
+        return os.path.join(self.index.save_dir, rows[slot]["name"])
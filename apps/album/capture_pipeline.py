@@ -0,0 +1,161 @@
+# capture_pipeline.py
+# Staged screen-recording pipeline:
+#
+#   grabber thread --> ring of preallocated frames --> encoder thread --> writer
+#
+# The grabber runs on a precise frame clock (sleeps until each deadline
+# instead of spinning) and only copies pixels into a free ring slot. Colour
+# conversion and encoding happen on the encoder thread, so a slow encode
+# never delays the next grab. When the ring is full the new frame is
+# dropped and counted; ticks missed because a grab overran are counted too.
+import threading
+import time
+
+import cv2
+import numpy as np
+
+RING_FRAMES = 8
+
+class FrameRing:
+    """Fixed set of preallocated frame buffers handed between two threads."""
+
+    def __init__(self, shape, count=RING_FRAMES, dtype=np.uint8):
+        self.slots = [np.empty(shape, dtype) for _ in range(count)]
+        self.free = list(range(count))
+        self.filled = []  # (slot index, capture time), oldest first
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def acquire(self):
+        """Return a free slot index, or None if the encoder is behind."""
+        with self.cond:
+            return self.free.pop() if self.free else None
+
+    def publish(self, index, timestamp):
+        with self.cond:
+            self.filled.append((index, timestamp))
+            self.cond.notify()
+
+    def take(self):
+        """Block for the oldest filled slot; None once closed and drained."""
+        with self.cond:
+            while not self.filled and not self.closed:
+                self.cond.wait()
+            return self.filled.pop(0) if self.filled else None
+
+    def release(self, index):
+        with self.cond:
+            self.free.append(index)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+class PipelineStats:
+    def __init__(self):
+        self.grabbed = 0
+        self.encoded = 0
+        self.dropped_full = 0    # Ring full: encoder could not keep up
+        self.missed_ticks = 0    # Grab overran its frame slot
+        self.started = None
+        self.stopped = None
+
+    def as_dict(self):
+        elapsed = (self.stopped or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "grabbed": self.grabbed,
+            "encoded": self.encoded,
+            "dropped_full": self.dropped_full,
+            "missed_ticks": self.missed_ticks,
+            "elapsed_s": elapsed,
+            "fps": self.encoded / elapsed if elapsed > 0 else 0.0,
+        }
+
+class RecordingPipeline:
+    """
+    make_grabber() is called on the grabber thread (screen grabbers such as
+    mss are thread-bound) and returns grab_into(buffer), which fills a
+    preallocated (height, width, 4) BGRA buffer.
+    writer needs write(bgr_frame) and release(), like cv2.VideoWriter.
+    """
+
+    def __init__(self, make_grabber, writer, width, height, fps, ring_frames=RING_FRAMES):
+        self.make_grabber = make_grabber
+        self.writer = writer
+        self.interval = 1.0 / fps
+        self.ring = FrameRing((height, width, 4), ring_frames)
+        self.bgr = np.empty((height, width, 3), np.uint8)
+        self.stats = PipelineStats()
+        self.stop_event = threading.Event()
+        self.threads = [threading.Thread(target=self._grab_loop, daemon=True),
+                        threading.Thread(target=self._encode_loop, daemon=True)]
+
+    def start(self):
+        self.stats.started = time.perf_counter()
+        for t in self.threads:
+            t.start()
+        return self
+
+    def stop(self):
+        """Stop grabbing, let the encoder drain the ring, release the writer."""
+        self.stop_event.set()
+        for t in self.threads:
+            t.join()
+        self.stats.stopped = time.perf_counter()
+        self.writer.release()
+        return self.stats.as_dict()
+
+    def _grab_loop(self):
+        try:
+            self._grab_frames(self.make_grabber())
+        finally:
+            self.ring.close()
+
+    def _grab_frames(self, grab_into):
+        next_tick = time.perf_counter()
+        while not self.stop_event.is_set():
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                # Event.wait doubles as an interruptible sleep
+                if self.stop_event.wait(delay):
+                    break
+            now = time.perf_counter()
+            index = self.ring.acquire()
+            if index is None:
+                self.stats.dropped_full += 1
+            else:
+                grab_into(self.ring.slots[index])
+                self.stats.grabbed += 1
+                self.ring.publish(index, now)
+            next_tick += self.interval
+            behind = time.perf_counter() - next_tick
+            if behind > 0:
+                # Skip the ticks we overran instead of bursting to catch up
+                skipped = int(behind / self.interval) + 1
+                self.stats.missed_ticks += skipped
+                next_tick += skipped * self.interval
+
+    def _encode_loop(self):
+        while True:
+            item = self.ring.take()
+            if item is None:
+                break
+            index, _ = item
+            cv2.cvtColor(self.ring.slots[index], cv2.COLOR_BGRA2BGR, dst=self.bgr)
+            self.ring.release(index)
+            self.writer.write(self.bgr)
+            self.stats.encoded += 1
+
+def mss_grabber(mss_factory, monitor):
+    """make_grabber for mss: opens its own mss instance on the calling thread."""
+    height, width = monitor["height"], monitor["width"]
+
+    def make_grabber():
+        sct = mss_factory()
+
+        def grab_into(buffer):
+            shot = sct.grab(monitor)
+            np.copyto(buffer, np.frombuffer(shot.raw, np.uint8).reshape(height, width, 4))
+        return grab_into
+    return make_grabber
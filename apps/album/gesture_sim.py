@@ -0,0 +1,89 @@
+# gesture_sim.py
+# Deterministic harness for gestures.GestureEngine: no GPIO, no sleeping.
+#
+# A simulated clock and a scripted button drive the real engine and timer
+# wheel. Each scenario is a list of (time, "press"/"release") edges and the
+# actions expected, with the time each should fire. Time only moves when
+# the harness advances it, so every run gives the same result.
+# Usage: python gesture_sim.py
+import sys
+
+from gestures import GestureEngine, TimerWheel, HOLD_TIME, DOUBLE_PRESS_WINDOW, DEBOUNCE
+
+STEP = 0.001  # Simulated time resolution
+
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class SimButton:
+    """Replays scripted edges into an engine while advancing the clock and wheel."""
+
+    def __init__(self, double_press=True):
+        self.clock = SimClock()
+        self.wheel = TimerWheel()
+        self.fired = []  # (time, action)
+        self.level = False  # What the pin reads right now
+        actions = {f"on_{name}": (lambda name=name: self.fired.append((round(self.clock.now, 3), name)))
+                   for name in ("screenshot", "record_start", "record_stop", "save_replay")}
+        self.engine = GestureEngine(self.wheel, self.clock, double_press=double_press,
+                                    is_pressed=lambda: self.level, **actions)
+
+    def run(self, edges, until):
+        edges = sorted(edges)
+        t = 0.0
+        while t <= until:
+            self.clock.now = t
+            self.wheel.advance(t)
+            while edges and edges[0][0] <= t + 1e-9:
+                _, edge = edges.pop(0)
+                self.level = edge == "press"
+                self.engine.pressed() if edge == "press" else self.engine.released()
+            t = round(t + STEP, 6)
+        return self.fired
+
+def tap(at, length=0.1):
+    return [(at, "press"), (at + length, "release")]
+
+H, W = HOLD_TIME, DOUBLE_PRESS_WINDOW
+SCENARIOS = [
+    ("short press", tap(0.0), [(0.1 + W, "screenshot")]),
+    ("long hold", [(0.0, "press"), (2.0, "release")], [(H, "record_start"), (2.0, "record_stop")]),
+    ("double press", tap(0.0) + tap(0.2), [(0.3, "save_replay")]),
+    ("hold to replay", tap(0.0) + [(0.2, "press"), (1.5, "release")],
+     [(0.2 + H, "save_replay"), (0.2 + H, "record_start"), (1.5, "record_stop")]),
+    ("two separate presses", tap(0.0) + tap(1.0), [(0.1 + W, "screenshot"), (1.1 + W, "screenshot")]),
+    ("second press just too late", tap(0.0) + tap(0.1 + W + 0.01),
+     [(0.1 + W, "screenshot"), (0.21 + 2 * W, "screenshot")]),
+    ("contact bounce", [(0.0, "press"), (DEBOUNCE / 4, "release"), (DEBOUNCE / 2, "press"), (0.1, "release")],
+     [(0.1 + W, "screenshot")]),
+    ("tap shorter than the debounce", [(0.0, "press"), (0.015, "release")], [(DEBOUNCE + W, "screenshot")]),
+    ("bounce on release", [(0.0, "press"), (0.1, "release"), (0.105, "press"), (0.11, "release")],
+     [(0.1 + W, "screenshot")]),
+    ("repeated edges", [(0.0, "press"), (0.05, "press"), (0.1, "release"), (0.15, "release")],
+     [(0.1 + W, "screenshot")]),
+    ("triple press", tap(0.0) + tap(0.2) + tap(0.4), [(0.3, "save_replay"), (0.5 + W, "screenshot")]),
+]
+
+def main():
+    failures = 0
+    cases = [(name, edges, expected, True) for name, edges, expected in SCENARIOS]
+    cases.append(("short press, replay off", tap(0.0), [(0.1, "screenshot")], False))
+    for name, edges, expected, double_press in cases:
+        until = max(t for t, _ in edges) + 2.0
+        fired = SimButton(double_press).run(edges, until)
+        expected = [(round(t, 3), action) for t, action in expected]
+        # Deadlines are float sums, so an action may land one simulated step late
+        ok = len(fired) == len(expected) and all(
+            action == want and abs(t - want_t) <= STEP + 1e-9
+            for (t, action), (want_t, want) in zip(fired, expected))
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {name}" + ("" if ok else f"\n      expected {expected}\n      got      {fired}"))
+    print(f"{len(cases) - failures}/{len(cases)} scenarios passed")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,229 @@
+# gestures.py
+# Event-driven gesture recognition for the capture button.
+#
+# The engine only reacts to edges (gpiozero's when_pressed/when_released)
+# and to timers; nothing polls the pin. Gestures:
+#   short press              -> screenshot (after the double-press window)
+#   long hold                -> record until release
+#   double press             -> save replay
+#   tap, then press and hold -> save replay, then record until release
+#
+#   IDLE --press--> DOWN --release--> WAIT --timeout--> screenshot, IDLE
+#                    |                  +--press--> DOWN2 --release--> replay, IDLE
+#                    +--hold--> RECORDING       |
+#                                 ^             +--hold--> replay, RECORDING
+#                                 +--release--> stop recording, IDLE
+#
+# An edge closer than DEBOUNCE to the last accepted one may be contact
+# bounce, so it is not acted on at once: a settle timer re-reads the button
+# when the debounce window ends and applies whatever the level is by then.
+# A very short tap therefore still counts as a tap.
+#
+# Timers live in a hashed timer wheel. In the console a WheelRunner thread
+# sleeps until the next deadline; gesture_sim.py drives the same engine
+# from a simulated clock so the timing logic can be checked without GPIO.
+import threading
+import time
+
+HOLD_TIME = 0.5        # Seconds held before a press counts as a hold
+DOUBLE_PRESS_WINDOW = 0.35
+DEBOUNCE = 0.02        # Edges closer together than this are contact bounce
+WHEEL_TICK = 0.01
+WHEEL_SLOTS = 256
+
+IDLE, DOWN, WAIT, DOWN2, RECORDING = "idle", "down", "wait", "down2", "recording"
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) schedule/cancel, advance() fires what is due."""
+
+    def __init__(self, tick=WHEEL_TICK, slots=WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.last_tick = None
+        self.lock = threading.Lock()
+
+    def schedule(self, deadline, callback):
+        """Run callback() from advance() once time reaches deadline; returns a handle."""
+        timer = [deadline, callback, False]  # deadline, callback, cancelled
+        with self.lock:
+            tick = int(deadline / self.tick)
+            if self.last_tick is not None and tick < self.last_tick:
+                tick = self.last_tick  # Already due: the next advance() still visits this slot
+            self.slots[tick % len(self.slots)].append(timer)
+        return timer
+
+    def cancel(self, timer):
+        if timer is not None:
+            timer[2] = True
+
+    def next_deadline(self):
+        with self.lock:
+            deadlines = [t[0] for slot in self.slots for t in slot if not t[2]]
+        return min(deadlines) if deadlines else None
+
+    def advance(self, now):
+        """Fire every timer due at or before now, in deadline order."""
+        due = []
+        with self.lock:
+            current = int(now / self.tick)
+            first = current if self.last_tick is None else self.last_tick
+            # Visit each slot passed since the last advance (each slot once at most)
+            for t in range(first, min(current, first + len(self.slots) - 1) + 1):
+                slot = self.slots[t % len(self.slots)]
+                keep = []
+                for timer in slot:
+                    if timer[2]:
+                        continue
+                    (due if timer[0] <= now else keep).append(timer)
+                slot[:] = keep
+            self.last_tick = current
+        for timer in sorted(due, key=lambda t: t[0]):
+            if not timer[2]:
+                timer[1]()
+
+class WheelRunner:
+    """Real-time driver for a TimerWheel: one thread that sleeps until the next deadline."""
+
+    def __init__(self, wheel=None, clock=time.monotonic):
+        self.wheel = wheel or TimerWheel()
+        self.clock = clock
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def schedule(self, deadline, callback):
+        timer = self.wheel.schedule(deadline, callback)
+        with self.cond:
+            self.cond.notify()  # The new deadline may be earlier than the one being waited for
+        return timer
+
+    def cancel(self, timer):
+        self.wheel.cancel(timer)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                deadline = self.wheel.next_deadline()
+                timeout = None if deadline is None else max(deadline - self.clock(), 0)
+                if timeout is None or timeout > 0:
+                    self.cond.wait(timeout)
+            self.wheel.advance(self.clock())
+
+class GestureEngine:
+    """
+    Feed pressed()/released() from the button callbacks. Actions are called
+    without the engine lock held, from the button or timer thread:
+    on_screenshot(), on_record_start(), on_record_stop(), on_save_replay().
+    With double_press=False a short press fires the screenshot on release.
+    is_pressed() reads the button level once an edge has settled; without
+    it the level of the last edge seen is used.
+    """
+
+    def __init__(self, timers, clock=time.monotonic, on_screenshot=None, on_record_start=None,
+                 on_record_stop=None, on_save_replay=None, hold_time=HOLD_TIME,
+                 double_window=DOUBLE_PRESS_WINDOW, debounce=DEBOUNCE, double_press=True,
+                 is_pressed=None):
+        self.timers = timers
+        self.clock = clock
+        self.actions = {"screenshot": on_screenshot, "record_start": on_record_start,
+                        "record_stop": on_record_stop, "save_replay": on_save_replay}
+        self.hold_time = hold_time
+        self.double_window = double_window
+        self.debounce = debounce
+        self.double_press = double_press
+        self.is_pressed = is_pressed
+        self.state = IDLE
+        self.is_down = False    # Level the state machine has acted on
+        self.raw_down = False   # Level of the last edge seen, bounce included
+        self.last_edge = None   # Time of the last accepted edge
+        self.timer = None
+        self.settle_timer = None
+        self.lock = threading.Lock()
+
+    # --- inputs ---
+    def pressed(self):
+        self._edge(True)
+
+    def released(self):
+        self._edge(False)
+
+    def _edge(self, down):
+        with self.lock:
+            now = self.clock()
+            self.raw_down = down
+            if down == self.is_down:
+                return  # Repeated edge
+            if self.last_edge is not None and now - self.last_edge < self.debounce:
+                # Maybe bounce: decide from the level once the contact has settled
+                if self.settle_timer is None:
+                    self.settle_timer = self.timers.schedule(self.last_edge + self.debounce, self._on_settle)
+                return
+            fired = self._accept(down, now)
+        self._fire(fired)
+
+    def _on_settle(self):
+        with self.lock:
+            self.settle_timer = None
+            down = self.is_pressed() if self.is_pressed is not None else self.raw_down
+            if down == self.is_down:
+                return  # It was bounce
+            fired = self._accept(down, self.clock())
+        self._fire(fired)
+
+    def _accept(self, down, now):
+        self.is_down = down
+        self.last_edge = now
+        return self._on_press(now) if down else self._on_release(now)
+
+    def _on_press(self, now):
+        if self.state == IDLE:
+            self._enter(DOWN, now + self.hold_time)
+        elif self.state == WAIT:
+            self._enter(DOWN2, now + self.hold_time)
+        return []
+
+    def _on_release(self, now):
+        if self.state == DOWN:
+            if not self.double_press:
+                self._enter(IDLE)
+                return ["screenshot"]
+            self._enter(WAIT, now + self.double_window)
+        elif self.state == DOWN2:
+            self._enter(IDLE)
+            return ["save_replay"]
+        elif self.state == RECORDING:
+            self._enter(IDLE)
+            return ["record_stop"]
+        return []
+
+    def _on_timeout(self, token):
+        with self.lock:
+            if token is not self.timer:
+                return  # Superseded by an edge that raced with the timer
+            self.timer = None
+            if self.state in (DOWN, DOWN2):
+                fired = ["record_start"] if self.state == DOWN else ["save_replay", "record_start"]
+                self._enter(RECORDING)
+            elif self.state == WAIT:
+                fired = ["screenshot"]
+                self._enter(IDLE)
+            else:
+                fired = []
+        self._fire(fired)
+
+    # --- helpers ---
+    def _enter(self, state, deadline=None):
+        self.state = state
+        if self.timer is not None:
+            self.timers.cancel(self.timer[0])
+        self.timer = None
+        if deadline is not None:
+            # The token identifies this timer in _on_timeout; it holds the wheel handle
+            token = []
+            token.append(self.timers.schedule(deadline, lambda: self._on_timeout(token)))
+            self.timer = token
+
+    def _fire(self, names):
+        for name in names:
+            action = self.actions[name]
+            if action is not None:
+                action()
@@ -0,0 +1,110 @@
+# replay_buffer.py
+# Always-on instant replay: the last N seconds of gameplay, kept encoded.
+#
+# ReplayBuffer is a RecordingPipeline writer. Frames are encoded to H.264
+# once, as they arrive, and the compressed packets are kept in memory. Old
+# packets are dropped a whole GOP at a time (so the buffer always starts on
+# a keyframe) as long as at least `seconds` of video remain, or whenever
+# the buffer holds more than `max_mb` of data. save() muxes the current
+# packets into an mp4 without decoding or re-encoding anything, while
+# capture keeps running.
+import threading
+from collections import deque
+from fractions import Fraction
+
+import av
+
+REPLAY_SECONDS = 30
+REPLAY_MAX_MB = 64
+REPLAY_CODEC = "libx264"
+
+class ReplayBuffer:
+    def __init__(self, width, height, fps, seconds=REPLAY_SECONDS, max_mb=REPLAY_MAX_MB):
+        self.fps = int(round(fps))
+        self.width = width
+        self.height = height
+        self.max_frames = int(seconds * self.fps)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.time_base = Fraction(1, self.fps)
+
+        self.codec = av.CodecContext.create(REPLAY_CODEC, "w")
+        self.codec.width = width
+        self.codec.height = height
+        self.codec.pix_fmt = "yuv420p"
+        self.codec.time_base = self.time_base
+        self.codec.framerate = self.fps
+        self.codec.gop_size = self.fps  # One keyframe per second bounds the trim granularity
+        # No B-frames, so packets come out in presentation order
+        self.codec.options = {"preset": "ultrafast", "tune": "zerolatency"}
+
+        self.packets = deque()  # (pts, dts, is_keyframe, data)
+        self.bytes = 0
+        self.next_pts = 0
+        self.lock = threading.Lock()
+
+    # --- pipeline writer interface ---
+    def write(self, bgr_frame):
+        frame = av.VideoFrame.from_ndarray(bgr_frame, format="bgr24")
+        frame.pts = self.next_pts
+        self.next_pts += 1
+        for packet in self.codec.encode(frame):
+            self._append(packet)
+
+    def release(self):
+        for packet in self.codec.encode(None):
+            self._append(packet)
+
+    # --- ring ---
+    def _append(self, packet):
+        data = bytes(packet)
+        with self.lock:
+            if not self.packets and not packet.is_keyframe:
+                return  # The buffer must start on a keyframe
+            self.packets.append((packet.pts, packet.dts, packet.is_keyframe, data))
+            self.bytes += len(data)
+            self._trim()
+
+    def _trim(self):
+        while True:
+            # The oldest GOP ends where the second keyframe starts; the newest GOP is never dropped
+            cut = next((i for i, p in enumerate(self.packets) if i and p[2]), None)
+            if cut is None:
+                return
+            remaining = self.packets[-1][0] - self.packets[cut][0] + 1
+            if self.bytes <= self.max_bytes and remaining < self.max_frames:
+                return
+            for _ in range(cut):
+                self.bytes -= len(self.packets.popleft()[3])
+
+    def stats(self):
+        with self.lock:
+            frames = self.packets[-1][0] - self.packets[0][0] + 1 if self.packets else 0
+            return {"seconds": frames / self.fps, "megabytes": self.bytes / (1024 * 1024),
+                    "packets": len(self.packets)}
+
+    # --- flush ---
+    def save(self, path):
+        """Write the buffered packets to an mp4 at path; capture is not interrupted."""
+        with self.lock:
+            packets = list(self.packets)  # Packet payloads are immutable bytes
+        if not packets:
+            return False
+        start = packets[0][0]
+        output = av.open(path, "w", format="mp4")
+        try:
+            stream = output.add_stream("h264", rate=self.fps)
+            stream.width = self.width
+            stream.height = self.height
+            stream.pix_fmt = "yuv420p"
+            stream.time_base = self.time_base
+            for pts, dts, keyframe, data in packets:
+                packet = av.Packet(data)
+                packet.pts = pts - start
+                packet.dts = dts - start
+                packet.is_keyframe = keyframe
+                packet.time_base = self.time_base
+                packet.stream = stream
+                output.mux(packet)
+        finally:
+            output.close()
+        return True
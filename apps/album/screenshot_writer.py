@@ -0,0 +1,45 @@
+# screenshot_writer.py
+# Background encoder for screenshots.
+#
+# The button handler only copies the grabbed pixels (a few ms) and queues
+# them; PNG compression, the write to a temp file and the atomic rename into
+# place all happen on this writer's thread, in the order shots were taken.
+import itertools
+import os
+import queue
+import threading
+
+from PIL import Image
+
+PNG_COMPRESS_LEVEL = 3  # Faster than zlib's default 6 for somewhat larger files
+
+class ScreenshotWriter:
+    def __init__(self, save_dir, on_saved=None, compress_level=PNG_COMPRESS_LEVEL):
+        """on_saved(path) runs on the writer thread after each file is in place."""
+        self.save_dir = save_dir
+        self.on_saved = on_saved
+        self.compress_level = compress_level
+        self.jobs = queue.Queue()
+        self.counter = itertools.count()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, bgra, width, height, final_path):
+        """Queue raw BGRA pixels (bytes, e.g. mss ScreenShot.raw) to be saved as final_path."""
+        self.jobs.put((bgra, width, height, final_path))
+
+    def pending(self):
+        return self.jobs.qsize()
+
+    def _run(self):
+        while True:
+            bgra, width, height, final_path = self.jobs.get()
+            temp_file = os.path.join(self.save_dir, f"temp_screenshot_{next(self.counter)}.png")
+            try:
+                img = Image.frombuffer("RGB", (width, height), bgra, "raw", "BGRX")
+                img.save(temp_file, "PNG", compress_level=self.compress_level)
+                os.replace(temp_file, final_path)
+            except OSError as e:
+                print(f"[!] Screenshot {final_path} failed: {e}")
+                continue
+            if self.on_saved:
+                self.on_saved(final_path)
@@ -0,0 +1,138 @@
+# server_loadtest.py
+# Concurrent load test for album_server.
+#
+# Each client thread keeps one HTTP/1.1 connection open and loops over a mix
+# of requests like a phone browsing the album: listing pages, thumbnails
+# (half of them revalidated with If-None-Match), random byte ranges in
+# videos and a few full downloads. Without a URL it starts a server on a
+# temporary directory of synthetic captures.
+# Usage: python server_loadtest.py [clients] [seconds] [url]
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from album_server import make_server
+from capture_index import CaptureIndex
+from thumb_cache import ThumbnailCache
+
+def make_fixture(save_dir, images=40, videos=6):
+    rng = np.random.default_rng(0)
+    for i in range(images):
+        cv2.imwrite(os.path.join(save_dir, f"2026-01-01_00-00-{i:02d}.png"),
+                    rng.integers(0, 255, (360, 640, 3), np.uint8))
+    for i in range(videos):
+        out = cv2.VideoWriter(os.path.join(save_dir, f"2026-01-02_00-00-{i:02d}.mp4"),
+                              cv2.VideoWriter_fourcc(*"mp4v"), 30, (640, 360))
+        for _ in range(150):
+            out.write(rng.integers(0, 255, (360, 640, 3), np.uint8))
+        out.release()
+
+def start_local_server():
+    save_dir = tempfile.mkdtemp(prefix="album-load-")
+    make_fixture(save_dir)
+    index = CaptureIndex(save_dir)
+    index.sync()
+    server = make_server(save_dir, ThumbnailCache(save_dir), index, 0, host="127.0.0.1")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+class Client:
+    def __init__(self, host, port, items, deadline):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.items = items
+        self.deadline = deadline
+        self.latencies = {}   # request kind -> [seconds]
+        self.bytes = 0
+        self.errors = 0
+        self.etags = {}
+
+    def request(self, kind, path, headers=None, expect=(200,)):
+        start = time.perf_counter()
+        try:
+            self.conn.request("GET", path, headers=headers or {})
+            resp = self.conn.getresponse()
+            body = resp.read()
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            self.conn.close()
+            return None
+        self.latencies.setdefault(kind, []).append(time.perf_counter() - start)
+        self.bytes += len(body)
+        if resp.status not in expect:
+            self.errors += 1
+        return resp
+
+    def run(self):
+        rng = random.Random(threading.get_ident())
+        videos = [item for item in self.items if item["kind"] == "video"]
+        while time.perf_counter() < self.deadline:
+            roll = rng.random()
+            if roll < 0.15:
+                self.request("listing", f"/api/captures?offset={rng.randrange(0, len(self.items))}&limit=20")
+            elif roll < 0.65:
+                item = rng.choice(self.items)
+                etag = self.etags.get(item["name"])
+                if etag and rng.random() < 0.5:
+                    self.request("thumb_304", item["thumb"], {"If-None-Match": etag}, expect=(304,))
+                else:
+                    resp = self.request("thumb", item["thumb"])
+                    if resp is not None:
+                        self.etags[item["name"]] = resp.getheader("ETag")
+            elif roll < 0.95 and videos:
+                item = rng.choice(videos)
+                start = rng.randrange(0, item["size"])
+                end = min(start + 256 * 1024, item["size"]) - 1
+                self.request("range", item["url"], {"Range": f"bytes={start}-{end}"}, expect=(206,))
+            else:
+                self.request("download", rng.choice(videos or self.items)["url"])
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(p * len(values)), len(values) - 1)]
+
+def run(clients=16, seconds=10.0, url=None):
+    url = url or start_local_server()
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+    conn.request("GET", "/api/captures?limit=500")
+    items = json.loads(conn.getresponse().read())["items"]
+    conn.close()
+    if not items:
+        print("No captures to test against")
+        return
+
+    deadline = time.perf_counter() + seconds
+    workers = [Client(parts.hostname, parts.port or 80, items, deadline) for _ in range(clients)]
+    threads = [threading.Thread(target=w.run) for w in workers]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    merged = {}
+    for w in workers:
+        for kind, values in w.latencies.items():
+            merged.setdefault(kind, []).extend(values)
+    total = sum(len(v) for v in merged.values())
+    print(f"{clients} clients, {elapsed:.1f}s against {url}")
+    print(f"  {total / elapsed:.0f} req/s, {sum(w.bytes for w in workers) / elapsed / 1e6:.1f} MB/s, "
+          f"{sum(w.errors for w in workers)} errors")
+    for kind, values in sorted(merged.items()):
+        print(f"  {kind:<9} n={len(values):<6} p50={percentile(values, 0.5) * 1000:7.2f}ms "
+              f"p99={percentile(values, 0.99) * 1000:7.2f}ms max={max(values) * 1000:7.2f}ms")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 16, float(args[1]) if len(args) > 1 else 10.0,
+        args[2] if len(args) > 2 else None)
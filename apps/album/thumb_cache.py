@@ -0,0 +1,135 @@
+# thumb_cache.py
+# On-disk thumbnail cache for the capture album.
+#
+# Thumbnails are small JPEGs in SAVE_DIR/.thumbs named
+#   <capture basename>.<mtime_ns>.<size>.jpg
+# so a capture that is rewritten (e.g. trimmed) simply misses the cache and
+# gets a new thumbnail. Thumbnails are generated on a worker pool as soon as
+# a capture is saved; prune() deletes the ones whose capture is gone or has
+# changed since.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from PIL import Image
+
+THUMB_DIR = ".thumbs"
+THUMB_SIZE = (200, 200)
+THUMB_QUALITY = 80
+THUMB_WORKERS = 2
+
+IMAGE_EXTS = (".png", ".jpg")
+VIDEO_EXTS = (".mp4",)
+
+def is_capture(name):
+    return name.lower().endswith(IMAGE_EXTS + VIDEO_EXTS) and not name.startswith("temp_")
+
+def render_thumbnail(path, size=THUMB_SIZE):
+    """Decode a capture into a thumbnail-sized RGB PIL image, or None."""
+    if path.lower().endswith(VIDEO_EXTS):
+        cap = cv2.VideoCapture(path)
+        ret, frame = cap.read()
+        cap.release()
+        if not ret:
+            return None
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    else:
+        img = Image.open(path)
+        img.draft("RGB", size)  # Lets JPEG decode at reduced scale
+        img = img.convert("RGB")
+    img.thumbnail(size)
+    return img
+
+class ThumbnailCache:
+    def __init__(self, save_dir, size=THUMB_SIZE, workers=THUMB_WORKERS):
+        self.save_dir = save_dir
+        self.dir = os.path.join(save_dir, THUMB_DIR)
+        self.size = size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumb")
+        self.pending = {}  # thumb path -> Future, so a capture is rendered once
+        self.lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def thumb_path(self, path):
+        """Cache file for the current version of path; raises OSError if path is gone."""
+        st = os.stat(path)
+        name = f"{os.path.basename(path)}.{st.st_mtime_ns}.{st.st_size}.jpg"
+        return os.path.join(self.dir, name)
+
+    def get(self, path):
+        """Return the thumbnail for path, rendering it now on a miss; None if unreadable."""
+        try:
+            thumb = self.thumb_path(path)
+        except OSError:
+            return None
+        try:
+            img = Image.open(thumb)
+            img.load()
+            return img
+        except OSError:
+            pass
+        return self.submit(path).result()
+
+    def submit(self, path):
+        """Render path's thumbnail on the worker pool; returns a Future of the image."""
+        try:
+            thumb = self.thumb_path(path)
+        except OSError:
+            thumb = None
+        with self.lock:
+            future = self.pending.get(thumb)
+            if future is None:
+                future = self.pending[thumb] = self.pool.submit(self._render, path, thumb)
+        return future
+
+    def _render(self, path, thumb):
+        try:
+            if thumb is None:
+                return None
+            if os.path.exists(thumb):
+                img = Image.open(thumb)
+                img.load()
+                return img
+            try:
+                img = render_thumbnail(path, self.size)
+            except OSError as e:
+                print(f"[!] Thumbnail failed for {path}: {e}")
+                return None
+            if img is None:
+                return None
+            tmp = thumb + ".tmp"
+            img.save(tmp, "JPEG", quality=THUMB_QUALITY)
+            os.replace(tmp, thumb)
+            return img
+        finally:
+            with self.lock:
+                self.pending.pop(thumb, None)
+
+    def warm(self):
+        """Queue thumbnails for every capture that does not have one yet."""
+        for name in os.listdir(self.save_dir):
+            if is_capture(name):
+                self.submit(os.path.join(self.save_dir, name))
+
+    def prune(self):
+        """Delete thumbnails of captures that were deleted or rewritten. Returns the count."""
+        removed = 0
+        for name in os.listdir(self.dir):
+            if name.endswith(".tmp"):
+                continue  # Being written by a worker
+            thumb = os.path.join(self.dir, name)
+            parts = name.rsplit(".", 3)
+            stale = len(parts) != 4 or parts[3] != "jpg"
+            if not stale:
+                try:
+                    stale = self.thumb_path(os.path.join(self.save_dir, parts[0])) != thumb
+                except OSError:
+                    stale = True  # Capture deleted
+            if stale:
+                try:
+                    os.remove(thumb)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
@@ -0,0 +1,205 @@
+# transcode_queue.py
+# Low-priority background transcoding of recordings into phone-friendly proxies.
+#
+# Recordings are full-resolution 60 FPS mp4v; the album server prefers a
+# proxy: H.264, at most PROXY_HEIGHT lines and PROXY_FPS, with the index at
+# the front of the file so phones can start playback straight away. Proxies
+# live in SAVE_DIR/.proxies named like thumbnails
+#   <capture basename>.<mtime_ns>.<size>.mp4
+# so a trimmed recording gets a new proxy and prune() drops the old one.
+#
+# One worker thread runs at the lowest CPU priority, pauses while
+# GAME_RUNNING_FILE exists and can be cancelled per capture or wholesale.
+# The flag file is a contract for whatever launches games: create it when a
+# game starts and remove it when the game exits. Nothing in this tree does
+# that yet, so until a launcher implements it the queue never pauses.
+import os
+import threading
+import time
+from collections import deque
+from fractions import Fraction
+
+import av
+
+from thumb_cache import VIDEO_EXTS
+
+PROXY_DIR = ".proxies"
+PROXY_HEIGHT = 720
+PROXY_FPS = 30
+PROXY_CRF = "26"
+TRANSCODE_NICE = 19
+GAME_RUNNING_FILE = "/tmp/game_running"  # Created/removed by the game launcher (external)
+PAUSE_POLL = 1.0       # Seconds between checks while paused
+PAUSE_CHECK_FRAMES = 10  # Decoded frames between pause/cancel checks
+
+class Cancelled(Exception):
+    pass
+
+def proxy_size(width, height, max_height=PROXY_HEIGHT):
+    """Scaled (width, height), even-sized for yuv420p, never upscaled."""
+    if height <= max_height:
+        return width - width % 2, height - height % 2
+    width = int(width * max_height / height)
+    return width - width % 2, max_height
+
+def transcode(src, dst, max_height=PROXY_HEIGHT, fps=PROXY_FPS, checkpoint=None):
+    """Write an H.264 proxy of src to dst. checkpoint() runs every few frames and may block or raise."""
+    with av.open(src) as inp:
+        vs = inp.streams.video[0]
+        vs.thread_type = "AUTO"
+        width, height = proxy_size(vs.codec_context.width, vs.codec_context.height, max_height)
+        with av.open(dst, "w", format="mp4", options={"movflags": "+faststart"}) as out:
+            ostream = out.add_stream("libx264", rate=fps)
+            ostream.width = width
+            ostream.height = height
+            ostream.pix_fmt = "yuv420p"
+            ostream.options = {"preset": "veryfast", "crf": PROXY_CRF}
+            step = Fraction(1, fps)
+            next_time = None
+            count = 0
+            for decoded, frame in enumerate(inp.decode(vs), 1):
+                if checkpoint and decoded % PAUSE_CHECK_FRAMES == 0:
+                    checkpoint()
+                if frame.pts is None:
+                    continue
+                t = frame.pts * vs.time_base
+                if next_time is not None and t < next_time:
+                    continue  # Drop frames above the proxy frame rate
+                next_time = (next_time or t) + step
+                scaled = frame.reformat(width=width, height=height, format="yuv420p")
+                scaled.pts = count
+                scaled.time_base = step
+                count += 1
+                for packet in ostream.encode(scaled):
+                    out.mux(packet)
+            for packet in ostream.encode(None):
+                out.mux(packet)
+    return count
+
+class TranscodeQueue:
+    def __init__(self, save_dir, on_done=None, game_flag=GAME_RUNNING_FILE):
+        """on_done(capture path, proxy path) runs on the worker thread."""
+        self.save_dir = save_dir
+        self.dir = os.path.join(save_dir, PROXY_DIR)
+        self.on_done = on_done
+        self.game_flag = game_flag
+        self.jobs = deque()    # Capture paths, oldest first
+        self.current = None
+        self.cancel_current = False
+        self.cond = threading.Condition()
+        os.makedirs(self.dir, exist_ok=True)
+        threading.Thread(target=self._run, daemon=True, name="transcode").start()
+
+    def proxy_path(self, path):
+        """Proxy file for the current version of path; raises OSError if path is gone."""
+        st = os.stat(path)
+        return os.path.join(self.dir, f"{os.path.basename(path)}.{st.st_mtime_ns}.{st.st_size}.mp4")
+
+    def proxy_for(self, path):
+        """The finished proxy of path, or None."""
+        try:
+            proxy = self.proxy_path(path)
+        except OSError:
+            return None
+        return proxy if os.path.exists(proxy) else None
+
+    # --- queue control ---
+    def submit(self, path):
+        if not path.lower().endswith(VIDEO_EXTS):
+            return
+        with self.cond:
+            if path != self.current and path not in self.jobs:
+                self.jobs.append(path)
+                self.cond.notify()
+
+    def cancel(self, path=None):
+        """Drop path (or every job) from the queue and abort it if it is running."""
+        with self.cond:
+            if path is None:
+                self.jobs.clear()
+            elif path in self.jobs:
+                self.jobs.remove(path)
+            if self.current is not None and path in (None, self.current):
+                self.cancel_current = True
+            self.cond.notify_all()
+
+    def status(self):
+        with self.cond:
+            return {"current": self.current, "queued": list(self.jobs), "paused": self.paused()}
+
+    def paused(self):
+        return os.path.exists(self.game_flag)
+
+    def warm(self):
+        """Queue every recording that has no proxy yet."""
+        for name in sorted(os.listdir(self.save_dir), reverse=True):  # Newest first
+            path = os.path.join(self.save_dir, name)
+            if name.lower().endswith(VIDEO_EXTS) and not name.startswith("temp_") and self.proxy_for(path) is None:
+                self.submit(path)
+
+    def prune(self):
+        """Delete proxies of captures that were deleted or rewritten. Returns the count."""
+        removed = 0
+        for name in os.listdir(self.dir):
+            if name.startswith("temp_"):
+                continue
+            proxy = os.path.join(self.dir, name)
+            parts = name.rsplit(".", 3)
+            try:
+                stale = len(parts) != 4 or self.proxy_path(os.path.join(self.save_dir, parts[0])) != proxy
+            except OSError:
+                stale = True
+            if stale:
+                try:
+                    os.remove(proxy)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    # --- worker ---
+    def _checkpoint(self):
+        """Called between frames: aborts cancelled jobs and sleeps while a game runs."""
+        while True:
+            with self.cond:
+                if self.cancel_current:
+                    raise Cancelled()
+                if not self.paused():
+                    return
+                self.cond.wait(PAUSE_POLL)  # cancel() wakes this early
+
+    def _run(self):
+        try:
+            # Linux applies the nice value per thread; encoder threads inherit it
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), TRANSCODE_NICE)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            with self.cond:
+                while not self.jobs:
+                    self.cond.wait()
+                path = self.current = self.jobs.popleft()
+                self.cancel_current = False
+            try:
+                self._checkpoint()  # Don't even open the file while a game runs
+                proxy = self.proxy_path(path)
+                if not os.path.exists(proxy):
+                    temp_file = os.path.join(self.dir, "temp_" + os.path.basename(proxy))
+                    started = time.perf_counter()
+                    try:
+                        frames = transcode(path, temp_file, checkpoint=self._checkpoint)
+                        os.replace(temp_file, proxy)
+                    finally:
+                        if os.path.exists(temp_file):
+                            os.remove(temp_file)
+                    print(f"[+] Proxy ready: {os.path.basename(path)} ({frames} frames, "
+                          f"{time.perf_counter() - started:.1f}s)")
+                    if self.on_done:
+                        self.on_done(path, proxy)
+            except Cancelled:
+                print(f"[*] Transcode cancelled: {os.path.basename(path)}")
+            except (OSError, av.FFmpegError) as e:
+                print(f"[!] Transcode failed for {path}: {e}")
+            finally:
+                with self.cond:
+                    self.current = None
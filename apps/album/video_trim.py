@@ -0,0 +1,214 @@
+# video_trim.py
+# Cut a time range out of a capture without re-encoding the whole clip.
+#
+# Packets between keyframes are copied as they are. In the default mode the
+# cut snaps outwards to keyframes: it starts at the last keyframe at or
+# before `start` and stops at the first keyframe at or after `end`, so
+# nothing is decoded at all. With accurate=True only the partial GOPs at
+# the two edges are decoded and re-encoded, trimmed to the exact frames,
+# and the GOPs in between are still copied.
+#
+# Re-encoded edge packets carry their own parameter sets in-band, so the
+# first copied keyframe after them gets the original parameter sets
+# (from the stream extradata) prepended again. Captures here are written
+# without B-frames and without audio; only the video stream is kept.
+import struct
+
+import av
+
+ENCODERS = {"h264": "libx264", "mpeg4": "mpeg4"}  # Codecs accurate mode can re-encode
+EDGE_BIT_RATE = 8_000_000
+PROGRESS_STEP = 0.01
+
+# --- bitstream helpers ---
+def annexb_nals(data):
+    """Split an Annex B byte stream into NAL units (without start codes)."""
+    nals = []
+    i = data.find(b"\x00\x00\x01")
+    while i != -1:
+        start = i + 3
+        i = data.find(b"\x00\x00\x01", start)
+        end = len(data) if i == -1 else i
+        nal = data[start:end]
+        if i != -1 and nal.endswith(b"\x00"):
+            nal = nal[:-1]  # Leading zero of a 4-byte start code
+        if nal:
+            nals.append(nal)
+    return nals
+
+def avcc_parameter_sets(extradata):
+    """SPS and PPS NAL units from an avcC record, and its NAL length size."""
+    length_size = (extradata[4] & 0x03) + 1
+    nals = []
+    pos = 5
+    for mask in (0x1F, 0xFF):  # SPS count is 5 bits, PPS count a full byte
+        count = extradata[pos] & mask
+        pos += 1
+        for _ in range(count):
+            (size,) = struct.unpack_from(">H", extradata, pos)
+            nals.append(extradata[pos + 2:pos + 2 + size])
+            pos += 2 + size
+    return nals, length_size
+
+def length_prefixed(nals, length_size):
+    return b"".join(len(nal).to_bytes(length_size, "big") + nal for nal in nals)
+
+class EdgeFormat:
+    """How re-encoded edge packets and the resumed copy are made to fit the original stream."""
+
+    def __init__(self, stream):
+        self.codec = stream.codec_context.name
+        extradata = stream.codec_context.extradata or b""
+        self.length_size = None
+        self.headers = extradata  # mpeg4: the VOL header can simply be repeated in-band
+        if self.codec == "h264" and extradata[:1] == b"\x01":
+            nals, self.length_size = avcc_parameter_sets(extradata)
+            self.headers = length_prefixed(nals, self.length_size)
+
+    def encoded(self, data):
+        # libx264 emits Annex B; the mp4 stream stores length-prefixed NAL units
+        if self.length_size is not None:
+            return length_prefixed(annexb_nals(data), self.length_size)
+        return data
+
+    def resumed_keyframe(self, data):
+        return self.headers + data
+
+# --- trim ---
+def scan(stream_container, stream):
+    """(pts, is_keyframe) of every video packet, demuxed without decoding."""
+    return [(p.pts, p.is_keyframe) for p in stream_container.demux(stream) if p.pts is not None]
+
+def trim(src, dst, start, end, accurate=False, progress=None):
+    """
+    Write [start, end) seconds of src to dst (mp4). progress(fraction) is
+    called from the calling thread as packets are processed.
+    Returns the (start, end) seconds actually kept. Raises ValueError if
+    start is at or past the last frame or nothing was written.
+    """
+    with av.open(src) as inp:
+        vs = inp.streams.video[0]
+        tb = vs.time_base
+        packets = sorted(scan(inp, vs))
+        if not packets:
+            raise ValueError(f"{src} has no video packets")
+        origin = packets[0][0]
+        start_pts = origin + int(round(start / tb))
+        end_pts = origin + int(round(end / tb))
+        if start_pts >= packets[-1][0]:
+            duration = float((packets[-1][0] - origin) * tb)
+            raise ValueError(f"start {start:.2f}s is past the end of {src} ({duration:.2f}s)")
+        keyframes = [pts for pts, key in packets if key]
+        if accurate and vs.codec_context.name not in ENCODERS:
+            accurate = False  # No matching encoder: fall back to a keyframe cut
+        k0 = max([k for k in keyframes if k <= start_pts] or keyframes[:1])
+        if accurate:
+            # head [k0, first_copy) re-encoded, [first_copy, tail_from) copied, tail re-encoded
+            first_copy = min([k for k in keyframes if k >= start_pts] or [end_pts])
+            tail_from = max([k for k in keyframes if k <= end_pts] or [k0])
+            if first_copy >= tail_from:
+                first_copy = tail_from = end_pts  # No whole GOP inside the cut
+            stop_pts, keep_from = end_pts, start_pts
+        else:
+            stop_pts = min([k for k in keyframes if k >= end_pts] or [packets[-1][0] + 1])
+            first_copy, tail_from, keep_from = k0, stop_pts, k0
+        total = sum(1 for pts, _ in packets if k0 <= pts < stop_pts) or 1
+
+        inp.seek(k0, stream=vs, backward=True, any_frame=False)
+        with av.open(dst, "w", format="mp4") as out:
+            ostream = out.add_stream_from_template(vs)
+            edges = EdgeFormat(vs)
+            writer = _Writer(out, ostream, tb, keep_from)
+            decoder = encoder = None
+            copied = 0
+            done = 0
+            last_report = 0.0
+            for packet in inp.demux(vs):
+                if packet.pts is None or packet.pts < k0:
+                    continue
+                if packet.pts >= stop_pts:
+                    break  # No B-frames: nothing after this is shown before stop_pts
+                if first_copy <= packet.pts < tail_from:
+                    if encoder is not None:  # Leaving the re-encoded head
+                        _finish_edge(writer, edges, decoder, encoder, keep_from, stop_pts)
+                        decoder = encoder = None
+                    data = bytes(packet)
+                    if not copied and first_copy > k0:
+                        data = edges.resumed_keyframe(data)  # Undo the head's in-band headers
+                    copied += 1
+                    writer.write(packet, data)
+                else:
+                    if encoder is None:
+                        decoder, encoder = _open_edge(vs)
+                    for frame in decoder.decode(packet):
+                        _encode_edge(writer, edges, encoder, frame, keep_from, stop_pts)
+                done += 1
+                if progress and done / total - last_report >= PROGRESS_STEP:
+                    last_report = done / total
+                    progress(min(last_report, 1.0))
+            if encoder is not None:
+                _finish_edge(writer, edges, decoder, encoder, keep_from, stop_pts)
+            if writer.first is None:
+                raise ValueError(f"nothing of {src} falls in {start:.2f}s - {end:.2f}s")
+            kept = writer.span()
+        if progress:
+            progress(1.0)
+    return float((kept[0] - origin) * tb), float((kept[1] - origin) * tb)
+
+def _open_edge(vs):
+    decoder = av.CodecContext.create(vs.codec_context.name, "r")
+    if vs.codec_context.extradata:
+        decoder.extradata = vs.codec_context.extradata
+    encoder = av.CodecContext.create(ENCODERS[vs.codec_context.name], "w")
+    encoder.width = vs.codec_context.width
+    encoder.height = vs.codec_context.height
+    encoder.pix_fmt = "yuv420p"
+    encoder.time_base = vs.time_base
+    encoder.framerate = vs.average_rate or vs.guessed_rate
+    encoder.bit_rate = vs.codec_context.bit_rate or EDGE_BIT_RATE
+    encoder.gop_size = 1 << 16  # One keyframe at the start of the edge is enough
+    encoder.max_b_frames = 0
+    if encoder.name == "libx264":
+        encoder.options = {"preset": "veryfast", "crf": "18", "bframes": "0"}
+    return decoder, encoder
+
+def _encode_edge(writer, edges, encoder, frame, keep_from, stop_pts):
+    if frame.pts is None or not keep_from <= frame.pts < stop_pts:
+        return
+    frame.pict_type = av.video.frame.PictureType.NONE
+    for packet in encoder.encode(frame.reformat(format="yuv420p")):
+        writer.write(packet, edges.encoded(bytes(packet)))
+
+def _finish_edge(writer, edges, decoder, encoder, keep_from, stop_pts):
+    for frame in decoder.decode(None):
+        _encode_edge(writer, edges, encoder, frame, keep_from, stop_pts)
+    for packet in encoder.encode(None):
+        writer.write(packet, edges.encoded(bytes(packet)))
+
+class _Writer:
+    """Muxes copied and re-encoded packets into one stream starting at time zero."""
+
+    def __init__(self, out, stream, time_base, base):
+        self.out = out
+        self.stream = stream
+        self.time_base = time_base
+        self.base = base
+        self.first = None
+        self.last = None
+
+    def write(self, packet, data):
+        """Mux data with packet's timing; edge encoders share the input time_base."""
+        pts, duration = packet.pts, packet.duration or 0
+        out = av.Packet(data)
+        out.pts = pts - self.base
+        out.dts = (pts if packet.dts is None else packet.dts) - self.base
+        out.is_keyframe = packet.is_keyframe
+        out.duration = duration
+        out.time_base = self.time_base
+        out.stream = self.stream
+        self.out.mux(out)
+        self.first = pts if self.first is None else min(self.first, pts)
+        self.last = pts + duration if self.last is None else max(self.last, pts + duration)
+
+    def span(self):
+        return (self.base, self.base) if self.first is None else (self.first, self.last)
@@ -1,85 +1,236 @@
 # device_connect.py
-import socket
+import asyncio
 import threading
 import time
 
+from discovery import get_discovery, SERVICE_CONNECT
+from peer_registry import PeerRegistry
+
 # --- CONFIGURATION ---
-BROADCAST_PORT = 50000   # Port used to broadcast presence
+# Presence broadcasting lives in discovery.py (shared with the other subsystems)
 CONNECT_PORT = 50001     # Port for direct connections
-BROADCAST_INTERVAL = 5   # Seconds between broadcast messages
+RECONNECT_INTERVAL = 10  # Seconds between greeting rounds to known devices
+CONNECT_TIMEOUT = 2.0    # Seconds before an outbound connect is abandoned
+PEER_QUEUE_SIZE = 32     # Messages buffered per peer; oldest dropped when full
+
+HELLO_MESSAGE = b"Hello from another OS device!"
+PING_PREFIX = b"PING "  # "PING <monotonic>\n" is answered with "PONG <monotonic>\n"
+PONG_PREFIX = b"PONG "
 
 # --- GLOBAL STATE ---
-known_devices = set()  # Stores (ip, port) tuples
+known_devices = PeerRegistry()  # Device IPs with last-seen, RTT and failure tracking
+peer_ports = {}  # {device_ip: connect port it announced}
+
+# --- DISCOVERY ---
+def on_peer_event(event, ip, port):
+    """Discovery callback keeping known_devices in sync with the live peer table."""
+    if event == "removed":
+        known_devices.discard(ip)
+        peer_ports.pop(ip, None)
+        engine.forget(ip)
+    else:
+        peer_ports[ip] = port
+        known_devices.add(ip)
+
+def peer_port(ip):
+    return peer_ports.get(ip, CONNECT_PORT)
+
+# --- ASYNC ENGINE ---
+class PeerChannel:
+    """Bounded outbound queue for one peer, drained by a single writer task."""
 
-# --- BROADCAST FUNCTION ---
+    def __init__(self, ip):
+        self.ip = ip
+        self.queue = asyncio.Queue(maxsize=PEER_QUEUE_SIZE)
+        self.task = asyncio.ensure_future(self._writer())
+
+    def close(self):
+        self.task.cancel()
+
+    def put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()  # Drop the oldest message rather than block
+        self.queue.put_nowait(message)
+
+    async def _writer(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.ip, peer_port(self.ip)), CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"Failed to connect to {self.ip}: {e or 'timeout'}")
+                known_devices.record_failure(self.ip)
+                continue
+            try:
+                writer.write(message)
+                # Send whatever else queued up meanwhile on the same connection
+                while not self.queue.empty():
+                    writer.write(self.queue.get_nowait())
+                await asyncio.wait_for(writer.drain(), CONNECT_TIMEOUT)
+                print(f"Connected to {self.ip}")
+                known_devices.record_success(self.ip)
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"Failed to send to {self.ip}: {e or 'timeout'}")
+                known_devices.record_failure(self.ip)
+            finally:
+                writer.close()
+
+class DeviceEngine:
+    """
+    Accepting and outbound connects on one asyncio event loop, running in a
+    background thread; discovery is delegated to the shared DiscoveryService. Blocking callers use the sync facade below.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.channels = {}
+        self.started = threading.Event()
+        self.error = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop thread once; later calls are no-ops."""
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self._run, daemon=True).start()
+        self.started.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._setup())
+        except OSError as e:
+            self.error = e
+            return
+        finally:
+            self.started.set()
+        self.loop.run_forever()
+
+    def call(self, coro, timeout=None):
+        """Run a coroutine on the engine loop from another thread and wait for it."""
+        return asyncio.run_coroutine_threadsafe(coro, self.start().loop).result(timeout)
+
+    async def _setup(self):
+        self.server = await asyncio.start_server(self._handle_client, '0.0.0.0', CONNECT_PORT)
+        print(f"Listening for connections on port {CONNECT_PORT}...")
+        discovery = get_discovery()
+        discovery.announce(SERVICE_CONNECT, CONNECT_PORT)
+        discovery.subscribe(SERVICE_CONNECT, on_peer_event)
+
+    async def _handle_client(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        print(f"Connected by {addr}")
+        try:
+            while True:
+                data = await reader.read(1024)
+                if not data:
+                    break
+                if data.startswith(PING_PREFIX):
+                    writer.write(PONG_PREFIX + data[len(PING_PREFIX):])
+                    await writer.drain()
+                    continue
+                print(f"[{addr}] {data.decode()}")
+        except Exception as e:
+            print(f"Connection error with {addr}: {e}")
+        finally:
+            writer.close()
+
+    def send(self, ip, message):
+        """Queue a message to ip without blocking the caller."""
+        self.start().loop.call_soon_threadsafe(self._send, ip, message)
+
+    def _send(self, ip, message):
+        channel = self.channels.get(ip)
+        if channel is None:
+            channel = self.channels[ip] = PeerChannel(ip)
+        channel.put(message)
+
+    def forget(self, ip):
+        """Drop the outbound channel of a device that left (safe from any thread)."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._forget, ip)
+
+    def _forget(self, ip):
+        channel = self.channels.pop(ip, None)
+        if channel is not None:
+            channel.close()
+
+    def greet_all(self):
+        """Fan out a greeting to every reachable device concurrently."""
+        for ip in known_devices.by_latency():
+            self.send(ip, HELLO_MESSAGE)
+
+    async def _ping(self, ip):
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, peer_port(ip)), CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            known_devices.record_failure(ip)
+            return
+        try:
+            sent = time.monotonic()
+            writer.write(PING_PREFIX + repr(sent).encode() + b"\n")
+            reply = await asyncio.wait_for(reader.readline(), CONNECT_TIMEOUT)
+            if reply.startswith(PONG_PREFIX):
+                known_devices.record_rtt(ip, time.monotonic() - sent)
+                known_devices.record_success(ip)
+            else:
+                known_devices.record_failure(ip)
+        except (OSError, asyncio.TimeoutError):
+            known_devices.record_failure(ip)
+        finally:
+            writer.close()
+
+    async def _ping_all(self):
+        await asyncio.gather(*(self._ping(ip) for ip in known_devices.reachable()))
+
+    def ping_all(self):
+        """Measure RTT to every reachable device concurrently (non-blocking)."""
+        asyncio.run_coroutine_threadsafe(self._ping_all(), self.start().loop)
+
+engine = DeviceEngine()
+
+# --- SYNC FACADE ---
+# The original thread entry points now just make sure the engine is running.
 def broadcast_presence():
     """Broadcast this device's presence to the local network."""
-    broadcaster = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    broadcaster.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    message = b"MY_OS_DEVICE"
-    while True:
-        broadcaster.sendto(message, ('<broadcast>', BROADCAST_PORT))
-        time.sleep(BROADCAST_INTERVAL)
+    engine.start()
 
-# --- LISTENER FUNCTION ---
 def listen_for_broadcasts():
     """Listen for other devices broadcasting their presence."""
-    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    listener.bind(('', BROADCAST_PORT))
-    while True:
-        data, addr = listener.recvfrom(1024)
-        if data == b"MY_OS_DEVICE":
-            known_devices.add(addr[0])
+    engine.start()
 
-# --- SERVER FUNCTION ---
 def accept_connections():
     """Accept incoming TCP connections from other devices."""
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(('', CONNECT_PORT))
-    server.listen(5)
-    print(f"Listening for connections on port {CONNECT_PORT}...")
-    while True:
-        conn, addr = server.accept()
-        print(f"Connected by {addr}")
-        threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+    engine.start()
 
 def handle_client(conn, addr):
-    """Handle a single connected client."""
-    try:
-        while True:
-            data = conn.recv(1024)
-            if not data:
-                break
-            print(f"[{addr}] {data.decode()}")
-    except Exception as e:
-        print(f"Connection error with {addr}: {e}")
-    finally:
-        conn.close()
-
-# --- CLIENT FUNCTION ---
+    """Handle a single already-accepted client socket on the engine loop."""
+    async def serve():
+        reader, writer = await asyncio.open_connection(sock=conn)
+        await engine._handle_client(reader, writer)
+    engine.call(serve())
+
 def connect_to_device(ip):
-    """Connect to a device via TCP."""
-    try:
-        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client.connect((ip, CONNECT_PORT))
-        client.sendall(b"Hello from another OS device!")
-        client.close()
-        print(f"Connected to {ip}")
-    except Exception as e:
-        print(f"Failed to connect to {ip}: {e}")
+    """Connect to a device via TCP (queued; never blocks the caller)."""
+    engine.send(ip, HELLO_MESSAGE)
 
 # --- MAIN ---
 if __name__ == "__main__":
-    # Start broadcast and listener threads
-    threading.Thread(target=broadcast_presence, daemon=True).start()
-    threading.Thread(target=listen_for_broadcasts, daemon=True).start()
-    threading.Thread(target=accept_connections, daemon=True).start()
+    engine.start()
 
     print("Device connection system running...")
     print("Known devices:", known_devices)
 
-    # Simple loop to connect to devices discovered
+    # Greet and probe all discovered devices concurrently
     while True:
-        time.sleep(10)
-        for ip in list(known_devices):
-            connect_to_device(ip)
+        time.sleep(RECONNECT_INTERVAL)
+        for ip in known_devices.evict_stale():
+            engine.forget(ip)
+        engine.ping_all()
+        engine.greet_all()
@@ -0,0 +1,169 @@
+# discovery.py
+# Shared LAN discovery: one UDP socket and one thread per process, used by
+# device_connect, the controller sync and the device info collector.
+#
+# Each device periodically broadcasts which services it offers and on which
+# TCP port. Peers that stop announcing expire after PEER_TTL seconds.
+# Subsystems subscribe to a service and get "added"/"seen"/"removed" callbacks.
+# Broadcasts loop back to the sender, so each announcement carries the
+# sending service's random node id and datagrams with our own id are dropped.
+import json
+import os
+import socket
+import threading
+import time
+
+DISCOVERY_PORT = 50000
+ANNOUNCE_INTERVAL = 5    # Seconds between announcements
+PEER_TTL = 3 * ANNOUNCE_INTERVAL
+
+SERVICE_CONNECT = "connect"
+SERVICE_CONTROLLER_SYNC = "controller-sync"
+SERVICE_DEVICE_INFO = "device-info"
+
+ANNOUNCE_MAGIC = b"OSDISC1 "  # Followed by JSON {"node": id, "services": {name: port}}
+LEGACY_PRESENCE = b"MY_OS_DEVICE"  # Older builds: connect on 50001
+# Their controller sync fought connect for the same port and sent unframed
+# JSON, so those devices are not offered as controller-sync peers.
+LEGACY_SERVICES = {SERVICE_CONNECT: 50001}
+
+def valid_port(port):
+    return isinstance(port, int) and not isinstance(port, bool) and 1 <= port <= 65535
+
+class DiscoveryService:
+    """Announces local services and tracks remote ones with TTL expiry."""
+
+    def __init__(self, port=DISCOVERY_PORT, interval=ANNOUNCE_INTERVAL, ttl=PEER_TTL):
+        self.port = port
+        self.interval = interval
+        self.ttl = ttl
+        self.node_id = os.urandom(8).hex()  # Per process; tells our own looped-back broadcasts apart
+        self.services = {}     # local service name -> tcp port
+        self.peers = {}        # (ip, service) -> [tcp port, expires_at]
+        self.subscribers = {}  # service -> [callback(event, ip, port)]
+        self.lock = threading.Lock()
+        self.sock = None
+
+    # --- public API ---
+    def announce(self, service, port):
+        """Advertise a local service; sent right away if already running."""
+        with self.lock:
+            self.services[service] = port
+        if self.sock is not None:
+            self._send_announcement()
+
+    def subscribe(self, service, callback):
+        """
+        callback(event, ip, port) is called from the discovery thread with
+        "added" for a new peer, "seen" for each repeated announcement and
+        "removed" on expiry. Peers already known are replayed as "added".
+        """
+        with self.lock:
+            self.subscribers.setdefault(service, []).append(callback)
+            current = [(ip, entry[0]) for (ip, svc), entry in self.peers.items() if svc == service]
+        for ip, port in current:
+            callback("added", ip, port)
+
+    def peers_for(self, service):
+        """Return {ip: port} of live peers offering service."""
+        with self.lock:
+            return {ip: entry[0] for (ip, svc), entry in self.peers.items() if svc == service}
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # SO_REUSEADDR lets several processes on one host receive the broadcasts
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.bind(('', self.port))
+        self.sock = sock
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    # --- internals ---
+    def _send_announcement(self):
+        with self.lock:
+            payload = ANNOUNCE_MAGIC + json.dumps({"node": self.node_id, "services": self.services}).encode()
+        try:
+            self.sock.sendto(payload, ('<broadcast>', self.port))
+        except OSError:
+            pass
+
+    def handle_datagram(self, data, ip, now=None):
+        """Record the services announced in one datagram."""
+        now = time.monotonic() if now is None else now
+        if data == LEGACY_PRESENCE:
+            services = LEGACY_SERVICES
+        elif data.startswith(ANNOUNCE_MAGIC):
+            try:
+                message = json.loads(data[len(ANNOUNCE_MAGIC):])
+                services = message["services"]
+                node = message.get("node")
+                if not isinstance(services, dict) or not all(
+                        isinstance(name, str) and valid_port(port) for name, port in services.items()):
+                    raise ValueError("services must map names to TCP ports")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return  # Not a well-formed announcement; ignore it
+            if node == self.node_id:
+                return  # Our own broadcast looped back
+        else:
+            return
+        events = []
+        with self.lock:
+            for service, port in services.items():
+                entry = self.peers.get((ip, service))
+                new = entry is None or entry[0] != port
+                events.append(("added" if new else "seen", service, port))
+                self.peers[(ip, service)] = [port, now + self.ttl]
+        for event, service, port in events:
+            self._notify(service, event, ip, port)
+
+    def expire(self, now=None):
+        """Drop peers whose announcements stopped arriving."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            gone = [(key, entry[0]) for key, entry in self.peers.items() if entry[1] <= now]
+            for key, _ in gone:
+                del self.peers[key]
+        for (ip, service), port in gone:
+            self._notify(service, "removed", ip, port)
+
+    def _notify(self, service, event, ip, port):
+        with self.lock:
+            callbacks = list(self.subscribers.get(service, ()))
+        for callback in callbacks:
+            try:
+                callback(event, ip, port)
+            except Exception as e:
+                print(f"Discovery callback for {service} failed: {e}")
+
+    def _run(self):
+        next_announce = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_announce:
+                self._send_announcement()
+                self.expire(now)
+                next_announce = now + self.interval
+            self.sock.settimeout(max(next_announce - now, 0.01))
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                time.sleep(0.1)
+                continue
+            try:
+                self.handle_datagram(data, addr[0])
+            except Exception as e:  # One odd datagram must not stop discovery for every subsystem
+                print(f"Ignoring discovery datagram from {addr[0]}: {e}")
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_discovery():
+    """Return the process-wide DiscoveryService, starting it on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DiscoveryService().start()
+        return _service
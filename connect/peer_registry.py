@@ -0,0 +1,125 @@
+# peer_registry.py
+# Liveness, round-trip time and failure tracking for discovered peers.
+#
+# Replaces the plain `known_devices` sets: it still supports add/discard,
+# `in`, len() and iteration over IPs, but also remembers when a peer was last
+# seen, a smoothed RTT from ping/pong, and consecutive failures with
+# exponential backoff so unreachable peers are skipped instead of retried on
+# every tick.
+import threading
+import time
+
+STALE_AFTER = 30.0       # Seconds without a sighting before a peer is evicted
+BACKOFF_MIN = 1.0        # First retry delay after a failure
+BACKOFF_MAX = 60.0
+RTT_SMOOTHING = 0.2      # EWMA weight of a new RTT sample
+
+class PeerInfo:
+    __slots__ = ("ip", "last_seen", "rtt", "failures", "retry_at")
+
+    def __init__(self, ip, now):
+        self.ip = ip
+        self.last_seen = now
+        self.rtt = None       # Smoothed round-trip time in seconds
+        self.failures = 0     # Consecutive failures
+        self.retry_at = 0.0   # Monotonic time before which we do not retry
+
+    def as_dict(self):
+        return {"ip": self.ip, "last_seen": self.last_seen, "rtt": self.rtt,
+                "failures": self.failures, "retry_at": self.retry_at}
+
+class PeerRegistry:
+    """Thread-safe table of peers keyed by IP."""
+
+    def __init__(self, stale_after=STALE_AFTER):
+        self.stale_after = stale_after
+        self.peers = {}
+        self.lock = threading.Lock()
+
+    # --- set-like API (drop-in for the old known_devices sets) ---
+    def add(self, ip, now=None):
+        """Record a sighting of ip (discovery announcement or inbound traffic)."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            peer = self.peers.get(ip)
+            if peer is None:
+                self.peers[ip] = PeerInfo(ip, now)
+            else:
+                peer.last_seen = now
+
+    def discard(self, ip):
+        with self.lock:
+            self.peers.pop(ip, None)
+
+    def __contains__(self, ip):
+        return ip in self.peers
+
+    def __len__(self):
+        return len(self.peers)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.peers))
+
+    def __repr__(self):
+        return f"PeerRegistry({sorted(self.peers)})"
+
+    # --- measurements ---
+    def record_rtt(self, ip, rtt):
+        with self.lock:
+            peer = self.peers.get(ip)
+            if peer is None:
+                return
+            peer.rtt = rtt if peer.rtt is None else peer.rtt + RTT_SMOOTHING * (rtt - peer.rtt)
+
+    def record_success(self, ip, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            peer = self.peers.get(ip)
+            if peer is not None:
+                peer.failures = 0
+                peer.retry_at = 0.0
+                peer.last_seen = now
+
+    def record_failure(self, ip, now=None):
+        """Count a failed connect/send and push the next retry out exponentially."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            peer = self.peers.get(ip)
+            if peer is None:
+                return
+            peer.failures += 1
+            peer.retry_at = now + min(BACKOFF_MIN * 2 ** (peer.failures - 1), BACKOFF_MAX)
+
+    # --- queries ---
+    def should_attempt(self, ip, now=None):
+        now = time.monotonic() if now is None else now
+        peer = self.peers.get(ip)
+        return peer is not None and peer.retry_at <= now
+
+    def reachable(self, now=None):
+        """IPs that are not currently backing off."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return [ip for ip, peer in self.peers.items() if peer.retry_at <= now]
+
+    def by_latency(self, now=None):
+        """Reachable IPs, lowest RTT first; peers without a measurement go last."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            live = [peer for peer in self.peers.values() if peer.retry_at <= now]
+        live.sort(key=lambda p: (p.rtt is None, p.rtt or 0.0))
+        return [peer.ip for peer in live]
+
+    def evict_stale(self, now=None):
+        """Remove peers not seen for stale_after seconds; returns their IPs."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            stale = [ip for ip, peer in self.peers.items() if now - peer.last_seen > self.stale_after]
+            for ip in stale:
+                del self.peers[ip]
+        return stale
+
+    def snapshot(self):
+        with self.lock:
+            return [peer.as_dict() for peer in self.peers.values()]
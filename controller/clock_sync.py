@@ -0,0 +1,91 @@
+# clock_sync.py
+# NTP-style clock offset and drift estimation between consoles.
+#
+# Each console keeps its own monotonic clock as the local timebase. A ping
+# carries t0 (our send time); the peer answers with t1 (its receive time)
+# and t2 (its send time); t3 is our receive time. Then
+#   offset = ((t1 - t0) + (t2 - t3)) / 2   (peer clock minus ours)
+#   delay  = (t3 - t0) - (t2 - t1)         (network round trip)
+# Only the lowest-delay samples in the window are trusted (they have the
+# least queueing asymmetry), and a least-squares fit over them gives drift.
+import threading
+import time
+from collections import deque
+
+CLOCK_WINDOW = 32     # Samples kept per peer
+BEST_SAMPLES = 8      # Lowest-delay samples used for the estimate
+MIN_DRIFT_SPAN = 10.0 # Seconds of samples needed before drift is estimated
+MAX_DRIFT = 500e-6    # Real oscillators stay well inside +-500 ppm
+
+def now():
+    """The local timebase every timestamp is expressed in."""
+    return time.monotonic()
+
+class PeerClock:
+    """Offset/drift estimate for one peer's clock relative to ours."""
+
+    def __init__(self, window=CLOCK_WINDOW, best=BEST_SAMPLES):
+        self.samples = deque(maxlen=window)  # (local time, offset, delay)
+        self.best = best
+        self.estimate = None  # (reference local time, offset at reference, drift)
+
+    def add_sample(self, t0, t1, t2, t3):
+        offset = ((t1 - t0) + (t2 - t3)) / 2
+        delay = (t3 - t0) - (t2 - t1)
+        self.samples.append((t3, offset, max(delay, 0.0)))
+        self._refit()
+        return offset, delay
+
+    def _refit(self):
+        best = sorted(self.samples, key=lambda s: s[2])[:self.best]
+        n = len(best)
+        mean_t = sum(s[0] for s in best) / n
+        mean_o = sum(s[1] for s in best) / n
+        var = sum((s[0] - mean_t) ** 2 for s in best)
+        drift = 0.0
+        span = max(s[0] for s in best) - min(s[0] for s in best)
+        if span >= MIN_DRIFT_SPAN and var > 0:
+            drift = sum((s[0] - mean_t) * (s[1] - mean_o) for s in best) / var
+            drift = max(-MAX_DRIFT, min(MAX_DRIFT, drift))
+        self.estimate = (mean_t, mean_o, drift)
+
+    def offset(self, at=None):
+        """Peer clock minus local clock at local time `at` (default: now), or None."""
+        if self.estimate is None:
+            return None
+        ref_t, ref_offset, drift = self.estimate
+        return ref_offset + drift * ((now() if at is None else at) - ref_t)
+
+    def stats(self):
+        if self.estimate is None:
+            return None
+        return {
+            "offset_s": self.offset(),
+            "drift_ppm": self.estimate[2] * 1e6,
+            "min_delay_s": min(s[2] for s in self.samples),
+            "samples": len(self.samples),
+        }
+
+class ClockSync:
+    """Per-peer clocks; converts peer timestamps into the local timebase."""
+
+    def __init__(self):
+        self.peers = {}
+        self.lock = threading.Lock()
+
+    def add_sample(self, peer, t0, t1, t2, t3):
+        with self.lock:
+            clock = self.peers.get(peer)
+            if clock is None:
+                clock = self.peers[peer] = PeerClock()
+            return clock.add_sample(t0, t1, t2, t3)
+
+    def to_local(self, peer, timestamp):
+        """Convert a peer timestamp to local time; None until the peer has been measured."""
+        clock = self.peers.get(peer)
+        offset = clock.offset() if clock is not None else None
+        return None if offset is None else timestamp - offset
+
+    def stats(self):
+        with self.lock:
+            return {peer: clock.stats() for peer, clock in self.peers.items()}
@@ -0,0 +1,45 @@
+# codec_bench.py
+# Microbenchmark: JSON vs state_codec for a typical 4-controller table.
+# Usage: python codec_bench.py [frames]
+import json
+import random
+import sys
+import time
+
+from state_codec import BUTTONS, AXES, StateEncoder, StateDecoder
+
+CONTROLLERS = 4
+
+def make_frames(count, seed=1):
+    """Simulated input: each tick a couple of buttons/axes change on one controller."""
+    rng = random.Random(seed)
+    table = {f"controller_{i}": {**{b: False for b in BUTTONS}, **{a: 0 for a in AXES}}
+             for i in range(CONTROLLERS)}
+    frames = []
+    for _ in range(count):
+        cid = f"controller_{rng.randrange(CONTROLLERS)}"
+        state = dict(table[cid])
+        state[rng.choice(BUTTONS)] = rng.random() < 0.5
+        state[rng.choice(AXES)] = rng.randint(-32768, 32767)
+        table = {**table, cid: state}
+        frames.append(table)
+    return frames
+
+def bench(name, encode, decode, frames):
+    start = time.perf_counter()
+    payloads = [encode(f) for f in frames]
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for p in payloads:
+        decode(p)
+    decode_time = time.perf_counter() - start
+    n = len(frames)
+    size = sum(len(p) for p in payloads) / n
+    print(f"{name:<16} encode {encode_time / n * 1e6:7.2f} us  "
+          f"decode {decode_time / n * 1e6:7.2f} us  {size:7.1f} bytes/frame")
+
+if __name__ == "__main__":
+    frames = make_frames(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+    bench("json", lambda f: json.dumps(f).encode(), lambda p: json.loads(p.decode()), frames)
+    bench("binary keyframe", StateEncoder(keyframe_interval=0).encode, StateDecoder().decode, frames)
+    bench("binary delta", StateEncoder().encode, StateDecoder().decode, frames)
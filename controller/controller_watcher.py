@@ -0,0 +1,225 @@
+# controller_watcher.py
+# Event-driven reading of /dev/controller_* state files.
+#
+# The device list is only re-globbed when the directory changes (hotplug),
+# each controller file stays open, and a file is only re-read when it
+# changed. Uses inotify on Linux and falls back to cheap stat() polling.
+import ctypes
+import ctypes.util
+import fnmatch
+import glob
+import json
+import os
+import select
+import struct
+import threading
+import time
+
+from latency_trace import tracer
+
+CONTROLLER_PATTERN = "/dev/controller_*"
+POLL_INTERVAL = 0.002  # Fallback stat() polling period
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_IGNORED = 0x8000
+IN_NONBLOCK = 0o4000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+def _load_inotify():
+    """Return libc if inotify is available, else None."""
+    name = ctypes.util.find_library("c")
+    if not name:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+def valid_state(state):
+    """A controller state is a JSON object of bool/number values."""
+    return isinstance(state, dict) and all(
+        isinstance(key, str) and isinstance(value, (bool, int, float)) for key, value in state.items())
+
+class ControllerFile:
+    """An open controller file plus the stat signature it was last read at."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.signature = None
+        self.rejected = False  # Last complete document wasn't a valid state (already logged)
+
+    def read_if_changed(self):
+        """
+        Return the parsed state if the file changed since the last read, else
+        None. Raises ValueError for a half-written or invalid document.
+        """
+        st = os.stat(self.path)
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature == self.signature:
+            return None
+        if self.signature is not None and st.st_ino != self.signature[0]:
+            # File was replaced (e.g. written via rename); follow the new inode
+            os.close(self.fd)
+            self.fd = os.open(self.path, os.O_RDONLY)
+        data = os.pread(self.fd, max(st.st_size, 4096), 0)
+        state = json.loads(data)
+        # Only remember the signature once a complete document parsed, so a
+        # half-written file is read again on the next event
+        self.signature = signature
+        if not valid_state(state):
+            if not self.rejected:
+                print(f"Ignoring {self.path}: expected an object of bool/number values; keeping the last state")
+                self.rejected = True
+            raise ValueError(f"{self.path} does not hold a controller state")
+        self.rejected = False
+        return state
+
+    def close(self):
+        os.close(self.fd)
+
+class ControllerWatcher:
+    """
+    Tracks every controller matching pattern and calls on_change(controller_id, state)
+    as soon as a state changes; state is None when the controller is unplugged.
+    State dicts are replaced, never mutated.
+    """
+
+    def __init__(self, on_change, pattern=CONTROLLER_PATTERN, use_inotify=True):
+        self.on_change = on_change
+        self.pattern = pattern
+        self.directory = os.path.dirname(pattern) or "."
+        self.files = {}  # path -> ControllerFile
+        self.states = {}  # controller_id -> state
+        self.dir_mtime = None
+        self.libc = _load_inotify() if use_inotify else None
+        self.inotify_fd = None
+        self.watches = {}  # watch descriptor -> path (directory wd maps to None)
+        self.stopped = threading.Event()
+
+    # --- device list ---
+    def rescan(self):
+        """Re-glob the device list; only called on startup and hotplug."""
+        paths = set(glob.glob(self.pattern))
+        for path in self.files.keys() - paths:
+            self._remove(path)
+        for path in paths - self.files.keys():
+            try:
+                self.files[path] = ControllerFile(path)
+            except OSError:
+                continue
+            self._watch(path)
+            self.refresh(path)
+
+    def _watch(self, path):
+        if self.inotify_fd is not None:
+            wd = self.libc.inotify_add_watch(self.inotify_fd, path.encode(), IN_MODIFY | IN_CLOSE_WRITE)
+            if wd >= 0:
+                self.watches[wd] = path
+
+    def _remove(self, path):
+        self.files.pop(path).close()
+        for wd, watched in list(self.watches.items()):
+            if watched == path:
+                del self.watches[wd]
+        cid = os.path.basename(path)
+        if self.states.pop(cid, None) is not None:
+            self.on_change(cid, None)
+
+    def refresh(self, path):
+        """Re-read one controller file and report it if its state changed."""
+        f = self.files.get(path)
+        if f is None:
+            return
+        try:
+            state = f.read_if_changed()
+        except FileNotFoundError:
+            self._remove(path)
+            return
+        except (OSError, ValueError):
+            return
+        cid = os.path.basename(path)
+        if state is not None and state != self.states.get(cid):
+            if tracer.enabled:
+                tracer.record("read", None, time.time() - f.signature[1] / 1e9)
+            self.states[cid] = state
+            self.on_change(cid, state)
+
+    # --- event loops ---
+    def run(self):
+        if self.libc is not None:
+            fd = self.libc.inotify_init1(IN_NONBLOCK)
+            if fd >= 0:
+                wd = self.libc.inotify_add_watch(fd, self.directory.encode(),
+                                                 IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO)
+                if wd >= 0:
+                    self.inotify_fd = fd
+                    self.watches[wd] = None
+                    return self._run_inotify()
+                os.close(fd)
+        self._run_polling()
+
+    def _run_inotify(self):
+        self.rescan()
+        while not self.stopped.is_set():
+            readable, _, _ = select.select([self.inotify_fd], [], [], 0.5)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.inotify_fd, 65536)
+            except BlockingIOError:
+                continue
+            rescan = False
+            changed = set()
+            pos = 0
+            while pos < len(data):
+                wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, pos)
+                name = data[pos + INOTIFY_EVENT.size:pos + INOTIFY_EVENT.size + length].rstrip(b"\0").decode()
+                pos += INOTIFY_EVENT.size + length
+                path = self.watches.get(wd)
+                if mask & IN_IGNORED:
+                    # Watched inode is gone (deleted or replaced by a rename)
+                    self.watches.pop(wd, None)
+                elif path is None and wd in self.watches:
+                    path = os.path.join(self.directory, name)
+                    if fnmatch.fnmatch(path, self.pattern):
+                        rescan = True
+                        if mask & IN_MOVED_TO and path in self.files:
+                            # Atomically replaced controller file: watch the new inode
+                            self._watch(path)
+                            changed.add(path)
+                elif path is not None:
+                    changed.add(path)
+            if rescan:
+                self.rescan()
+            for path in changed:
+                self.refresh(path)
+        os.close(self.inotify_fd)
+
+    def _run_polling(self):
+        while not self.stopped.is_set():
+            try:
+                mtime = os.stat(self.directory).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self.dir_mtime:
+                self.dir_mtime = mtime
+                self.rescan()
+            for path in list(self.files):
+                self.refresh(path)
+            self.stopped.wait(POLL_INTERVAL)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
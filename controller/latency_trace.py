@@ -0,0 +1,142 @@
+# latency_trace.py
+# Opt-in latency tracing for the controller pipeline.
+#
+# Stages (seconds, recorded per peer where it applies):
+#   read        controller file mtime -> state parsed by the watcher
+#   queue       state parsed -> picked up by the sync loop
+#   encode      state_codec encode, per peer
+#   send        socket send, per peer
+#   transit     sender's read time -> frame received and decoded here (needs clock sync)
+#   merge       RemoteStateStore.apply
+#   end_to_end  sender's read time -> merged here (needs clock sync)
+#
+# Enable with CONTROLLER_TRACE=1. When disabled, call sites only pay for
+# one attribute check (`if tracer.enabled:`) and never read the clock.
+# Stats are served as JSON on 127.0.0.1:TRACE_PORT and/or dumped to a file.
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+TRACE_ENABLED = os.environ.get("CONTROLLER_TRACE") == "1"
+TRACE_PORT = int(os.environ.get("CONTROLLER_TRACE_PORT", "50010"))
+TRACE_DUMP_FILE = os.environ.get("CONTROLLER_TRACE_FILE")  # Optional periodic dump
+TRACE_DUMP_INTERVAL = 10
+
+SUB_BITS = 5            # 32 sub-buckets per power of two: ~3% relative error
+SUB_COUNT = 1 << SUB_BITS
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of microsecond values with sparse buckets."""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket_of(value):
+        if value < 2 * SUB_COUNT:
+            return value
+        shift = value.bit_length() - (SUB_BITS + 1)
+        return (shift + 1) * SUB_COUNT + (value >> shift) - SUB_COUNT
+
+    @staticmethod
+    def bucket_high(bucket):
+        """Highest value that falls into bucket."""
+        if bucket < 2 * SUB_COUNT:
+            return bucket
+        shift = bucket // SUB_COUNT - 1
+        sub = bucket % SUB_COUNT + SUB_COUNT
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = max(int(seconds * 1e6), 0)
+        bucket = self.bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """Value (microseconds) at or below which fraction p of samples fall."""
+        if not self.count:
+            return None
+        target = max(1, int(p * self.count + 0.999999))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return min(self.bucket_high(bucket), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50_us": self.percentile(0.50),
+            "p99_us": self.percentile(0.99),
+            "p999_us": self.percentile(0.999),
+            "max_us": self.max,
+        }
+
+class Tracer:
+    """Histograms keyed by (stage, peer); peer is None for local stages."""
+
+    def __init__(self, enabled=TRACE_ENABLED):
+        self.enabled = enabled
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, peer, seconds):
+        with self.lock:
+            hist = self.histograms.get((stage, peer))
+            if hist is None:
+                hist = self.histograms[(stage, peer)] = LatencyHistogram()
+            hist.record(seconds)
+
+    def stats(self):
+        """{stage: {peer or "local": summary}}"""
+        with self.lock:
+            out = {}
+            for (stage, peer), hist in self.histograms.items():
+                out.setdefault(stage, {})[peer or "local"] = hist.summary()
+            return out
+
+    def dump(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.stats(), f, indent=2)
+        os.replace(tmp, path)
+
+    def start_dump(self, path, interval=TRACE_DUMP_INTERVAL):
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.dump(path)
+        threading.Thread(target=loop, daemon=True).start()
+
+    def serve(self, port=TRACE_PORT):
+        """Serve GET /stats as JSON on localhost."""
+        tracer = self
+
+        class StatsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/stats"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(tracer.stats()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), StatsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+tracer = Tracer()
@@ -0,0 +1,185 @@
+# state_codec.py
+# Compact binary wire format for controller states.
+#
+# A controller state is {"A": bool, ..., "JOY_X": int}. On the wire the
+# buttons are packed into one 32-bit mask and the axes into int16 values.
+#
+# Frame layout (version 1, network byte order):
+#   header   : version (B), flags (B), sequence (H), entry count (B)
+#   entry    : id length (B), id (utf-8), change mask (B), then
+#              buttons (I) if CHANGED_BUTTONS, then one int16 per changed axis
+#
+# A keyframe carries every field of every controller and replaces the
+# receiver's table. A delta frame only carries controllers and fields that
+# changed since the previous frame on the same connection. TCP delivery
+# stands in for acknowledgement, so the sender resets its encoder (forcing a
+# keyframe) whenever a connection is re-established.
+import struct
+from collections.abc import Mapping
+
+CODEC_VERSION = 1
+KEYFRAME_INTERVAL = 60  # Frames between forced keyframes
+
+BUTTONS = (
+    "A", "B", "X", "Y", "L", "R", "ZL", "ZR",
+    "PLUS", "MINUS", "HOME", "CAPTURE",
+    "UP", "DOWN", "LEFT", "RIGHT", "LSTICK", "RSTICK",
+)
+AXES = ("JOY_X", "JOY_Y", "JOY_RX", "JOY_RY")
+
+FLAG_KEYFRAME = 0x01
+CHANGED_BUTTONS = 0x01
+CHANGED_AXES = tuple(0x02 << i for i in range(len(AXES)))
+CHANGED_REMOVED = 0x80
+ANY_AXIS_CHANGED = sum(CHANGED_AXES)
+ALL_CHANGED = CHANGED_BUTTONS | ANY_AXIS_CHANGED
+
+HEADER = struct.Struct("!BBHB")
+BUTTON_MASK = struct.Struct("!I")
+AXIS = struct.Struct("!h")
+AXIS_MIN, AXIS_MAX = -32768, 32767
+
+BUTTON_BITS = tuple((name, 1 << bit) for bit, name in enumerate(BUTTONS))
+
+def axis_value(value):
+    """Clamp an axis reading to int16; anything non-numeric reads as centred (0)."""
+    try:
+        return max(AXIS_MIN, min(AXIS_MAX, int(value)))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+def pack_state(state):
+    """
+    Turn a state dict into (button_mask, axes_tuple). Unknown keys are
+    ignored; raises ValueError if state is not a mapping.
+    """
+    if not isinstance(state, Mapping):
+        raise ValueError(f"controller state must be a mapping, not {type(state).__name__}")
+    mask = 0
+    for name, bit in BUTTON_BITS:
+        if state.get(name):
+            mask |= bit
+    axes = tuple(axis_value(state.get(name, 0)) for name in AXES)
+    return mask, axes
+
+def unpack_state(packed):
+    """Inverse of pack_state."""
+    mask, axes = packed
+    state = {name: bool(mask >> bit & 1) for bit, name in enumerate(BUTTONS)}
+    state.update(zip(AXES, axes))
+    return state
+
+class StateEncoder:
+    """Encodes successive controller tables, sending only what changed."""
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.reset()
+
+    def reset(self):
+        """Forget the receiver's state; the next frame will be a keyframe."""
+        self.base = {}
+        self.sources = {}
+        self.seq = 0
+        self.since_keyframe = None
+
+    def encode(self, states):
+        keyframe = self.since_keyframe is None or self.since_keyframe >= self.keyframe_interval
+        # State dicts are replaced, never mutated, so an unchanged object
+        # can reuse the packed form from the previous frame.
+        packed = {}
+        for cid, state in states.items():
+            if self.sources.get(cid) is state:
+                packed[cid] = self.base[cid]
+            else:
+                packed[cid] = pack_state(state)
+        out = bytearray()
+        count = 0
+        for cid, (mask, axes) in packed.items():
+            old = None if keyframe else self.base.get(cid)
+            if old is None:
+                changed = ALL_CHANGED
+            else:
+                changed = CHANGED_BUTTONS if mask != old[0] else 0
+                for i, value in enumerate(axes):
+                    if value != old[1][i]:
+                        changed |= CHANGED_AXES[i]
+                if not changed:
+                    continue
+            name = cid.encode()
+            out.append(len(name))
+            out += name
+            out.append(changed)
+            if changed & CHANGED_BUTTONS:
+                out += BUTTON_MASK.pack(mask)
+            for i, value in enumerate(axes):
+                if changed & CHANGED_AXES[i]:
+                    out += AXIS.pack(value)
+            count += 1
+        if not keyframe:
+            for cid in self.base.keys() - packed.keys():
+                name = cid.encode()
+                out.append(len(name))
+                out += name
+                out.append(CHANGED_REMOVED)
+                count += 1
+        if count > 255:
+            raise ValueError(f"too many controllers in one frame: {count}")
+
+        self.seq = (self.seq + 1) & 0xFFFF
+        self.since_keyframe = 0 if keyframe else self.since_keyframe + 1
+        self.base = packed
+        self.sources = dict(states)
+        flags = FLAG_KEYFRAME if keyframe else 0
+        return HEADER.pack(CODEC_VERSION, flags, self.seq, count) + bytes(out)
+
+class StateDecoder:
+    """Applies frames from one StateEncoder and returns the full controller table."""
+
+    def __init__(self):
+        self.states = {}
+        self.views = {}
+        self.seq = None
+
+    def decode(self, frame):
+        version, flags, seq, count = HEADER.unpack_from(frame)
+        if version != CODEC_VERSION:
+            raise ValueError(f"unsupported codec version {version}")
+        if flags & FLAG_KEYFRAME:
+            states = {}
+            views = {}
+        elif self.seq is None or seq != (self.seq + 1) & 0xFFFF:
+            raise ValueError(f"delta frame {seq} does not follow frame {self.seq}")
+        else:
+            states = dict(self.states)
+            views = dict(self.views)
+
+        pos = HEADER.size
+        for _ in range(count):
+            length = frame[pos]
+            cid = frame[pos + 1:pos + 1 + length].decode()
+            pos += 1 + length
+            changed = frame[pos]
+            pos += 1
+            if changed & CHANGED_REMOVED:
+                states.pop(cid, None)
+                views.pop(cid, None)
+                continue
+            mask, axes = states.get(cid, (0, (0,) * len(AXES)))
+            if changed & CHANGED_BUTTONS:
+                mask, = BUTTON_MASK.unpack_from(frame, pos)
+                pos += BUTTON_MASK.size
+            if changed & ANY_AXIS_CHANGED:
+                axes = list(axes)
+                for i in range(len(AXES)):
+                    if changed & CHANGED_AXES[i]:
+                        axes[i], = AXIS.unpack_from(frame, pos)
+                        pos += AXIS.size
+                axes = tuple(axes)
+            states[cid] = (mask, axes)
+            views[cid] = unpack_state((mask, axes))
+
+        self.states = states
+        self.views = views
+        self.seq = seq
+        return dict(views)
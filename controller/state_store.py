@@ -0,0 +1,91 @@
+# state_store.py
+# Merged controller state from every peer, keyed by (peer, controller_id).
+#
+# Writers (TCP accept threads, UDP receiver) apply whole controller tables
+# under a lock with last-writer-wins by timestamp. The table itself is
+# copy-on-write: every write publishes a new dict, so readers (the game
+# loop) never take the lock and never copy anything.
+import threading
+import time
+from types import MappingProxyType
+
+class ContentionLock:
+    """A Lock that counts how often and how long callers had to wait for it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_time = 0.0
+
+    def __enter__(self):
+        if not self.lock.acquire(blocking=False):
+            start = time.perf_counter()
+            self.lock.acquire()
+            self.wait_time += time.perf_counter() - start
+            self.contended += 1
+        self.acquisitions += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.lock.release()
+
+    def stats(self):
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "contention_ratio": self.contended / self.acquisitions if self.acquisitions else 0.0,
+            "wait_time_s": self.wait_time,
+        }
+
+class RemoteStateStore:
+    """Thread-safe last-writer-wins store of remote controller states."""
+
+    def __init__(self):
+        self.lock = ContentionLock()
+        self.entries = MappingProxyType({})  # (peer, controller_id) -> (timestamp, state)
+        self.peer_tables = {}  # peer -> (timestamp, frozenset of controller ids)
+
+    def apply(self, peer, states, timestamp=None):
+        """
+        Merge one full controller table from peer. Entries older than what
+        is stored are ignored; controllers missing from a newer table are removed.
+        Returns True if the table was newer than the last one from this peer.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            last = self.peer_tables.get(peer)
+            if last is not None and timestamp < last[0]:
+                return False
+            entries = dict(self.entries)
+            for cid, state in states.items():
+                key = (peer, cid)
+                current = entries.get(key)
+                if current is None or timestamp >= current[0]:
+                    entries[key] = (timestamp, MappingProxyType(state))
+            if last is not None:
+                for cid in last[1] - states.keys():
+                    entries.pop((peer, cid), None)
+            self.peer_tables[peer] = (timestamp, frozenset(states))
+            self.entries = MappingProxyType(entries)
+        return True
+
+    def remove_peer(self, peer):
+        with self.lock:
+            entries = {key: value for key, value in self.entries.items() if key[0] != peer}
+            self.peer_tables.pop(peer, None)
+            self.entries = MappingProxyType(entries)
+
+    def get(self, peer, controller_id):
+        """O(1) lock-free lookup; returns the state mapping or None."""
+        entry = self.entries.get((peer, controller_id))
+        return entry[1] if entry is not None else None
+
+    def snapshot(self):
+        """
+        Immutable view of {(peer, controller_id): (timestamp, state)}. It is
+        the published table itself, so taking a snapshot costs nothing and it
+        never changes underneath the caller.
+        """
+        return self.entries
@@ -0,0 +1,58 @@
+# store_stress.py
+# Stress test for RemoteStateStore: writer threads play the accept/UDP
+# threads, reader threads play the game loop. Reports throughput and lock
+# contention.
+# Usage: python store_stress.py [writers] [readers] [seconds]
+import sys
+import threading
+import time
+
+from state_store import RemoteStateStore
+from codec_bench import make_frames
+
+def run(writers=4, readers=2, seconds=2.0):
+    store = RemoteStateStore()
+    tables = make_frames(1000)
+    stop = threading.Event()
+    writes = [0] * writers
+    reads = [0] * readers
+
+    def writer(i):
+        peer = f"10.0.0.{i}"
+        n = 0
+        while not stop.is_set():
+            store.apply(peer, tables[n % len(tables)], time.time())
+            n += 1
+        writes[i] = n
+
+    def reader(i):
+        n = 0
+        while not stop.is_set():
+            snap = store.snapshot()
+            for peer, cid in snap:
+                store.get(peer, cid)
+            n += 1
+        reads[i] = n
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    stats = store.lock.stats()
+    print(f"writers {writers}  readers {readers}  {seconds:.1f}s")
+    print(f"writes/s         {sum(writes) / seconds:,.0f}")
+    print(f"snapshots/s      {sum(reads) / seconds:,.0f}")
+    print(f"lock contended   {stats['contended']:,} of {stats['acquisitions']:,} ({stats['contention_ratio']:.2%})")
+    print(f"lock wait total  {stats['wait_time_s'] * 1000:.1f} ms "
+          f"({stats['wait_time_s'] / max(stats['contended'], 1) * 1e6:.1f} us per contended acquire)")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 4,
+        int(args[1]) if len(args) > 1 else 2,
+        float(args[2]) if len(args) > 2 else 2.0)
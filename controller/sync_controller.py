@@ -1,101 +1,505 @@
 # multi_controller_sync.py
+import os
+import sys
 import socket
 import threading
 import time
 import json
-import os
-import glob
+import struct
+from collections import deque
+
+from state_codec import StateEncoder, StateDecoder
+from controller_watcher import ControllerWatcher
+from state_store import RemoteStateStore
+from clock_sync import ClockSync, now as clock_now
+from latency_trace import tracer, TRACE_DUMP_FILE
 
-BROADCAST_PORT = 50000
-CONNECT_PORT = 50001
-BROADCAST_INTERVAL = 5
+# Shared discovery service lives next to device_connect
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "connect"))
+from discovery import get_discovery, SERVICE_CONTROLLER_SYNC
+from peer_registry import PeerRegistry
+
+SYNC_PORT = 50002  # TCP streams and UDP input packets; connect uses 50001
 SYNC_INTERVAL = 0.05  # 20 FPS
+CONNECT_TIMEOUT = 1.0
+RECONNECT_BACKOFF_MIN = 0.1
+RECONNECT_BACKOFF_MAX = 5.0
+MAX_FRAME_SIZE = 1 << 20
+PING_INTERVAL = 1.0  # Seconds between RTT probes to each peer
+UDP_REDUNDANCY = 3  # Each UDP packet repeats the last N state frames
+
+# Peers listed here get controller states over UDP instead of TCP:
+# {"192.168.1.20": "udp"}. Everyone else uses the TCP stream.
+PEER_TRANSPORTS = {}
 
-known_devices = set()
+known_devices = PeerRegistry()  # Live peers with RTT and failure tracking
+peer_ports = {}  # {peer_ip: controller-sync port it announced}
 controller_states = {}  # {"controller_id": {button states, axes}}
+remote_states = RemoteStateStore()  # {(peer_ip, "controller_id"): (local timestamp, state)}
+peer_clocks = ClockSync()  # Offset/drift of each peer's clock, fed by ping/pong
 
 # --- DEVICE DISCOVERY ---
-def broadcast_presence():
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    msg = b"MY_OS_DEVICE"
+def on_peer_event(event, ip, port):
+    if event == "removed":
+        known_devices.discard(ip)
+        peer_ports.pop(ip, None)
+        remote_states.remove_peer(ip)  # Its controllers left with it
+    else:
+        peer_ports[ip] = port
+        known_devices.add(ip)
+
+def start_discovery():
+    discovery = get_discovery()
+    discovery.announce(SERVICE_CONTROLLER_SYNC, SYNC_PORT)
+    discovery.subscribe(SERVICE_CONTROLLER_SYNC, on_peer_event)
+
+# --- FRAMING ---
+# Every message on a peer connection is one frame: 4-byte length, 1-byte type, payload.
+FRAME_HEADER = struct.Struct("!IB")
+FRAME_STATE_JSON = 1  # Legacy JSON state table, still accepted from older peers
+FRAME_STATE_BIN = 2   # state_codec keyframe/delta
+FRAME_PING = 3        # Payload: t0, the sender's clock
+FRAME_PONG = 4        # Payload: t0 echoed, t1 receive time, t2 send time (responder's clock)
+FRAME_STATE_STAMPED = 5  # Sender-clock timestamp followed by a FRAME_STATE_BIN payload
+PING = struct.Struct("!d")
+PONG = struct.Struct("!ddd")
+STAMP = struct.Struct("!d")
+
+def send_frame(sock, frame_type, payload):
+    sock.sendall(FRAME_HEADER.pack(len(payload), frame_type) + payload)
+
+class FrameReader:
+    """Reassembles length-prefixed frames from arbitrary stream chunks."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        while len(self.buffer) >= FRAME_HEADER.size:
+            length, frame_type = FRAME_HEADER.unpack_from(self.buffer)
+            if length > MAX_FRAME_SIZE:
+                raise ValueError(f"frame too large: {length} bytes")
+            end = FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            frames.append((frame_type, bytes(self.buffer[FRAME_HEADER.size:end])))
+            del self.buffer[:end]
+        return frames
+
+def read_frames(conn):
+    """Yield (frame_type, payload) tuples until the peer closes the connection."""
+    reader = FrameReader()
     while True:
-        sock.sendto(msg, ('<broadcast>', BROADCAST_PORT))
-        time.sleep(BROADCAST_INTERVAL)
+        data = conn.recv(65536)
+        if not data:
+            return
+        for frame in reader.feed(data):
+            yield frame
+
+# --- PEER CONNECTIONS ---
+encode_errors = {}  # peer -> last encode error logged
+
+def encode_or_drop(encoder, states, ip):
+    """
+    Encode one controller table, or log and return None when it can't be
+    encoded; only that frame is lost, the connection and encoder carry on.
+    """
+    try:
+        return encoder.encode(states)
+    except (ValueError, TypeError, AttributeError) as e:
+        if encode_errors.get(ip) != str(e):  # Same bad state every tick: log it once
+            encode_errors[ip] = str(e)
+            print(f"Dropping controller states for {ip} that can't be encoded: {e}")
+        return None
+
+class PeerConnection:
+    """
+    One long-lived TCP connection to a peer, owned by its own sender thread.
+    Only the newest controller table is kept: a slow or unreachable peer never
+    blocks the sync loop and never receives a backlog of stale states. The
+    table is delta-encoded against what was last sent on this connection.
+    Connect results and ping round trips are reported to registry.
+    """
+
+    def __init__(self, ip, port=SYNC_PORT, registry=None):
+        self.ip = ip
+        self.port = port
+        self.registry = registry
+        self.sock = None
+        self.backoff = RECONNECT_BACKOFF_MIN
+        self.encoder = StateEncoder()
+        self.pending_states = None
+        self.frames = deque(maxlen=64)
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def send_states(self, states, timestamp):
+        """Queue a controller table snapshot taken at timestamp, replacing any unsent one."""
+        with self.cond:
+            self.pending_states = (states, timestamp)
+            self.cond.notify()
+
+    def send(self, frame_type, payload):
+        """Queue a single control frame."""
+        with self.cond:
+            self.frames.append((frame_type, payload))
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def _connect(self):
+        sock = socket.create_connection((self.ip, self.port), timeout=CONNECT_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(None)
+        threading.Thread(target=self._read_replies, args=(sock,), daemon=True).start()
+        return sock
+
+    def _read_replies(self, sock):
+        """Read frames the peer sends back on our connection (pongs)."""
+        try:
+            for frame_type, payload in read_frames(sock):
+                if frame_type == FRAME_PONG:
+                    t3 = clock_now()
+                    t0, t1, t2 = PONG.unpack(payload)
+                    offset, delay = peer_clocks.add_sample(self.ip, t0, t1, t2, t3)
+                    if self.registry is not None:
+                        self.registry.record_rtt(self.ip, delay)
+        except (OSError, ValueError, struct.error):
+            pass
+
+    def _disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending_states is None and not self.frames and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    break
+                frames = list(self.frames)
+                self.frames.clear()
+                states = self.pending_states
+                self.pending_states = None
+            try:
+                if self.sock is None:
+                    self.sock = self._connect()
+                    self.encoder.reset()
+                for frame_type, payload in frames:
+                    send_frame(self.sock, frame_type, payload)
+                if states is not None:
+                    states, timestamp = states
+                    t0 = clock_now()
+                    body = encode_or_drop(self.encoder, states, self.ip)
+                    if body is not None:
+                        t1 = clock_now()
+                        send_frame(self.sock, FRAME_STATE_STAMPED, STAMP.pack(timestamp) + body)
+                        if tracer.enabled:
+                            tracer.record("encode", self.ip, t1 - t0)
+                            tracer.record("send", self.ip, clock_now() - t1)
+                self.backoff = RECONNECT_BACKOFF_MIN
+                if self.registry is not None:
+                    self.registry.record_success(self.ip)
+            except OSError:
+                self._disconnect()
+                if self.registry is not None:
+                    self.registry.record_failure(self.ip)
+                # Wait out the backoff; newer states replace these meanwhile
+                with self.cond:
+                    self.cond.wait_for(lambda: self.closed, timeout=self.backoff)
+                self.backoff = min(self.backoff * 2, RECONNECT_BACKOFF_MAX)
+        self._disconnect()
+
+# --- UDP INPUT CHANNEL ---
+# A UDP packet is a version byte and a frame count, followed by up to
+# UDP_REDUNDANCY frames, newest last. Each frame is (sequence, sender
+# timestamp, length, state_codec keyframe), so every frame stands alone and
+# one lost packet is covered by the copies in the next one.
+UDP_VERSION = 1
+UDP_HEADER = struct.Struct("!BB")
+UDP_FRAME = struct.Struct("!IdH")
+
+def encode_udp_packet(frames):
+    """frames: list of (seq, timestamp, payload), oldest first."""
+    parts = [UDP_HEADER.pack(UDP_VERSION, len(frames))]
+    for seq, ts, payload in frames:
+        parts.append(UDP_FRAME.pack(seq, ts, len(payload)))
+        parts.append(payload)
+    return b"".join(parts)
 
-def listen_for_broadcasts():
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.bind(('', BROADCAST_PORT))
+def decode_udp_packet(packet):
+    version, count = UDP_HEADER.unpack_from(packet)
+    if version != UDP_VERSION:
+        raise ValueError(f"unsupported UDP version {version}")
+    pos = UDP_HEADER.size
+    frames = []
+    for _ in range(count):
+        seq, ts, length = UDP_FRAME.unpack_from(packet, pos)
+        pos += UDP_FRAME.size
+        frames.append((seq, ts, packet[pos:pos + length]))
+        pos += length
+    return frames
+
+class UdpInputReceiver:
+    """Per-sender sequence tracking: delivers each frame once, in order, and drops stale ones."""
+
+    def __init__(self):
+        self.last_seq = 0
+        self.decoder = StateDecoder()
+        self.received = 0
+        self.recovered = 0  # Frames that only arrived as a redundant copy
+        self.stale = 0
+
+    def feed(self, packet):
+        """Return [(seq, timestamp, states)] for the frames in packet not seen before."""
+        frames = decode_udp_packet(packet)
+        fresh = []
+        for seq, ts, payload in frames:
+            if seq <= self.last_seq:
+                continue
+            if seq != frames[-1][0]:
+                self.recovered += 1
+            fresh.append((seq, ts, self.decoder.decode(payload)))
+            self.last_seq = seq
+        if not fresh:
+            self.stale += 1
+        self.received += len(fresh)
+        return fresh
+
+class UdpPeer(PeerConnection):
+    """
+    Sends controller states to a peer as redundant UDP datagrams. Control
+    frames still travel over the inherited TCP connection.
+    """
+
+    def __init__(self, ip, port, udp_sock, redundancy=UDP_REDUNDANCY, registry=None):
+        super().__init__(ip, port, registry)
+        self.udp_sock = udp_sock
+        self.udp_encoder = StateEncoder(keyframe_interval=0)
+        self.udp_seq = 0
+        self.history = deque(maxlen=redundancy)
+
+    def send_states(self, states, timestamp):
+        payload = encode_or_drop(self.udp_encoder, states, self.ip)
+        if payload is None:
+            return
+        self.udp_seq += 1
+        self.history.append((self.udp_seq, timestamp, payload))
+        try:
+            self.udp_sock.sendto(encode_udp_packet(list(self.history)), (self.ip, self.port))
+        except OSError:
+            pass
+
+def udp_receiver(sock=None, on_states=None):
+    """Receive UDP input packets on SYNC_PORT and hand fresh states to on_states."""
+    if sock is None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('', SYNC_PORT))
+    on_states = on_states or on_remote_states
+    receivers = {}
     while True:
-        data, addr = sock.recvfrom(1024)
-        if data == b"MY_OS_DEVICE":
-            known_devices.add(addr[0])
+        packet, addr = sock.recvfrom(65536)
+        receiver = receivers.setdefault(addr, UdpInputReceiver())
+        try:
+            fresh = receiver.feed(packet)
+        except (ValueError, struct.error):
+            continue
+        for seq, ts, states in fresh:
+            on_states(addr, states, peer_clocks.to_local(addr[0], ts))
+
+class PeerManager:
+    """
+    Keeps exactly one PeerConnection (or UdpPeer) per known device and sends
+    to them in the order given to update(), closest peer first.
+    """
+
+    def __init__(self, port=SYNC_PORT, transports=PEER_TRANSPORTS, registry=None, ports=None):
+        self.port = port          # Used for peers whose port discovery hasn't reported
+        self.ports = ports if ports is not None else {}
+        self.transports = transports
+        self.registry = registry
+        self.peers = {}
+        self.order = []
+        self.udp_sock = None
+        self.lock = threading.Lock()
+
+    def _port(self, ip):
+        return self.ports.get(ip, self.port)
+
+    def _open(self, ip):
+        port = self._port(ip)
+        if self.transports.get(ip) == "udp":
+            if self.udp_sock is None:
+                self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            return UdpPeer(ip, port, self.udp_sock, registry=self.registry)
+        return PeerConnection(ip, port, self.registry)
+
+    def update(self, ips):
+        """Open connections to new peers and drop peers that disappeared."""
+        order = list(ips)
+        ips = set(order)
+        with self.lock:
+            for ip in ips - self.peers.keys():
+                self.peers[ip] = self._open(ip)
+            for ip in self.peers.keys() - ips:
+                self.peers.pop(ip).close()
+            for ip, peer in list(self.peers.items()):
+                if peer.port != self._port(ip):  # Peer restarted on another port
+                    peer.close()
+                    self.peers[ip] = self._open(ip)
+            self.order = order
+
+    def _ordered(self):
+        with self.lock:
+            return [self.peers[ip] for ip in self.order if ip in self.peers]
+
+    def broadcast_states(self, states, timestamp=None):
+        timestamp = clock_now() if timestamp is None else timestamp
+        for peer in self._ordered():
+            peer.send_states(states, timestamp)
+
+    def ping_all(self):
+        for peer in self._ordered():
+            peer.send(FRAME_PING, PING.pack(clock_now()))
+
+peer_manager = PeerManager(registry=known_devices, ports=peer_ports)
 
 # --- TCP SERVER ---
 def accept_connections():
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(('', CONNECT_PORT))
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('', SYNC_PORT))
     server.listen(5)
     while True:
         conn, addr = server.accept()
         threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
 
 def handle_client(conn, addr):
+    decoder = StateDecoder()
     try:
-        while True:
-            data = conn.recv(4096)
-            if not data:
-                break
-            remote_state = json.loads(data.decode())
-            # Merge remote controller states
-            print(f"[{addr}] Remote controller: {remote_state}")
+        for frame_type, payload in read_frames(conn):
+            timestamp = None
+            if frame_type == FRAME_STATE_STAMPED:
+                sent, = STAMP.unpack_from(payload)
+                remote_state = decoder.decode(payload[STAMP.size:])
+                timestamp = peer_clocks.to_local(addr[0], sent)
+            elif frame_type == FRAME_STATE_BIN:
+                remote_state = decoder.decode(payload)
+            elif frame_type == FRAME_STATE_JSON:
+                remote_state = json.loads(payload.decode())
+            elif frame_type == FRAME_PING:
+                t1 = clock_now()
+                t0, = PING.unpack(payload)
+                send_frame(conn, FRAME_PONG, PONG.pack(t0, t1, clock_now()))
+                continue
+            else:
+                continue
+            on_remote_states(addr, remote_state, timestamp)
     except:
         pass
     finally:
         conn.close()
 
-# --- READ CONTROLLERS ---
-def detect_controllers():
+def on_remote_states(addr, remote_state, timestamp=None):
     """
-    Detect all connected controllers (Joy-Cons, USB, etc.) via device files.
-    Example: /dev/controller_*
+    Merge a peer's controller table into remote_states (last writer wins).
+    timestamp is in the local timebase; None (peer clock not measured yet)
+    falls back to the arrival time.
     """
-    return glob.glob("/dev/controller_*")  # Each controller exposed as a file
+    if tracer.enabled:
+        return _traced_merge(addr[0], remote_state, timestamp)
+    if timestamp is None:
+        timestamp = clock_now()
+    remote_states.apply(addr[0], remote_state, timestamp)
 
-def read_controller(file_path):
-    """
-    Read a controller file and parse JSON for state.
-    Expected format: {"A": bool, "B": bool, "JOY_X": int, ...}
-    """
-    try:
-        with open(file_path, "r") as f:
-            state = json.load(f)
-            controller_states[os.path.basename(file_path)] = state
-    except:
-        pass
+last_traced_stamp = {}  # peer -> newest sender timestamp already traced
+
+def _traced_merge(peer, remote_state, timestamp):
+    start = clock_now()
+    remote_states.apply(peer, remote_state, start if timestamp is None else timestamp)
+    done = clock_now()
+    tracer.record("merge", peer, done - start)
+    # Keepalives repeat the last stamp; only trace frames carrying a new read
+    if timestamp is not None and timestamp > last_traced_stamp.get(peer, float("-inf")):
+        last_traced_stamp[peer] = timestamp
+        tracer.record("transit", peer, start - timestamp)
+        tracer.record("end_to_end", peer, done - timestamp)
+
+# --- READ CONTROLLERS ---
+# The ControllerWatcher thread owns reading /dev/controller_*; it replaces
+# entries in controller_states and wakes the sync loop on every change.
+# Expected format: {"A": bool, "B": bool, "JOY_X": int, ...}
+# Only the buttons and axes listed in state_codec are sent to peers.
+# Frames are stamped with the time the newest state was read, so receivers
+# can order inputs and measure latency from the moment of the read.
+states_lock = threading.Lock()
+states_changed = threading.Event()
+last_change_at = None   # Read time of the newest state
+unsent_since = None     # Read time of the oldest change not yet picked up (tracing only)
+
+def on_controller_change(controller_id, state):
+    global last_change_at, unsent_since
+    changed_at = clock_now()
+    with states_lock:
+        if state is None:
+            controller_states.pop(controller_id, None)
+        else:
+            controller_states[controller_id] = state
+        last_change_at = changed_at
+        if unsent_since is None:
+            unsent_since = changed_at
+    states_changed.set()
 
 # --- SYNC CONTROLLERS ---
 def sync_controllers():
+    global unsent_since
+    ControllerWatcher(on_controller_change).start()
+    next_ping = 0.0
     while True:
-        for ctrl_file in detect_controllers():
-            read_controller(ctrl_file)
+        # Send as soon as a controller changes; SYNC_INTERVAL is only the keepalive period
+        states_changed.wait(SYNC_INTERVAL)
+        states_changed.clear()
+        with states_lock:
+            snapshot = dict(controller_states)
+            stamp = last_change_at if last_change_at is not None else clock_now()
+            picked_up = unsent_since
+            unsent_since = None
+        if tracer.enabled and picked_up is not None:
+            tracer.record("queue", None, clock_now() - picked_up)
 
-        # Broadcast each controller state to all devices
-        for ip in list(known_devices):
-            try:
-                client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                client.connect((ip, CONNECT_PORT))
-                client.sendall(json.dumps(controller_states).encode())
-                client.close()
-            except:
-                pass
-        time.sleep(SYNC_INTERVAL)
+        # Push the current states over the persistent peer connections,
+        # closest peers first; peers that keep failing are skipped while they back off
+        peer_manager.update(known_devices.by_latency())
+        peer_manager.broadcast_states(snapshot, stamp)
+
+        now = clock_now()
+        if now >= next_ping:
+            for ip in known_devices.evict_stale(now):
+                remote_states.remove_peer(ip)
+            peer_manager.ping_all()
+            next_ping = now + PING_INTERVAL
 
 # --- MAIN ---
 if __name__ == "__main__":
-    threading.Thread(target=broadcast_presence, daemon=True).start()
-    threading.Thread(target=listen_for_broadcasts, daemon=True).start()
+    if tracer.enabled:
+        tracer.serve()
+        if TRACE_DUMP_FILE:
+            tracer.start_dump(TRACE_DUMP_FILE)
+    start_discovery()
     threading.Thread(target=accept_connections, daemon=True).start()
+    threading.Thread(target=udp_receiver, daemon=True).start()
     threading.Thread(target=sync_controllers, daemon=True).start()
 
     print("Multi-controller sync running...")
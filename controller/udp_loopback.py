@@ -0,0 +1,74 @@
+# udp_loopback.py
+# Local loopback harness for the UDP input channel.
+# Sends simulated controller frames to 127.0.0.1 with random packet loss and
+# reports delivery, recovery through redundancy, and one-way latency.
+# Usage: python udp_loopback.py [frames] [loss_rate] [redundancy]
+import socket
+import random
+import sys
+import threading
+import time
+
+import sync_controller
+from sync_controller import UdpPeer, UdpInputReceiver
+from codec_bench import make_frames
+from clock_sync import now
+
+class LossySocket:
+    """Wraps a UDP socket and drops outgoing datagrams at the given rate."""
+
+    def __init__(self, sock, loss_rate, seed=1):
+        self.sock = sock
+        self.loss_rate = loss_rate
+        self.rng = random.Random(seed)
+        self.dropped = 0
+
+    def sendto(self, data, addr):
+        if self.rng.random() < self.loss_rate:
+            self.dropped += 1
+            return len(data)
+        return self.sock.sendto(data, addr)
+
+def run(frames=2000, loss_rate=0.05, redundancy=sync_controller.UDP_REDUNDANCY, interval=0.001):
+    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    recv_sock.bind(("127.0.0.1", 0))
+    recv_sock.settimeout(0.5)
+    port = recv_sock.getsockname()[1]
+
+    receiver = UdpInputReceiver()
+    latencies = []
+
+    def receive():
+        while True:
+            try:
+                packet, _ = recv_sock.recvfrom(65536)
+            except socket.timeout:
+                return
+            received = now()
+            for seq, ts, states in receiver.feed(packet):
+                latencies.append(received - ts)
+
+    thread = threading.Thread(target=receive)
+    thread.start()
+
+    lossy = LossySocket(socket.socket(socket.AF_INET, socket.SOCK_DGRAM), loss_rate)
+    peer = UdpPeer("127.0.0.1", port, lossy, redundancy)
+    for table in make_frames(frames):
+        peer.send_states(table, now())
+        time.sleep(interval)
+    thread.join()
+    peer.close()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6 if latencies else 0
+    print(f"frames sent      {frames}")
+    print(f"packets dropped  {lossy.dropped} ({loss_rate:.0%} loss, redundancy {redundancy})")
+    print(f"frames delivered {receiver.received} ({receiver.received / frames:.2%})")
+    print(f"recovered        {receiver.recovered} via redundant copies")
+    print(f"latency us       p50 {pct(0.5):.0f}  p99 {pct(0.99):.0f}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 2000,
+        float(args[1]) if len(args) > 1 else 0.05,
+        int(args[2]) if len(args) > 2 else sync_controller.UDP_REDUNDANCY)
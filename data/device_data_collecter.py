@@ -1,17 +1,30 @@
 # mutual_device_info.py
+import os
+import sys
 import socket
 import threading
 import json
 import platform
 import psutil
+import queue
 import time
 
-BROADCAST_PORT = 50003
+# Shared discovery service lives next to device_connect
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "connect"))
+from discovery import get_discovery, SERVICE_DEVICE_INFO
+from peer_registry import PeerRegistry
+
 CONNECT_PORT = 50004
-BROADCAST_INTERVAL = 5
+CONNECT_TIMEOUT = 2.0
+LEGACY_BROADCAST_PORT = 50003  # Older builds announce b"TRUSTED_OS_DEVICE" here
+LEGACY_PRESENCE = b"TRUSTED_OS_DEVICE"
 
-known_devices = set()
+known_devices = PeerRegistry()  # Live devices with last-seen, RTT and failure tracking
+peer_ports = {}  # {device_ip: info port it announced}
 approved_devices = set()  # Devices the user allowed
+denied_devices = set()  # Devices the user refused; never asked again
+pending_approval = queue.Queue()  # New devices waiting for the user's answer
+awaiting_answer = set()  # IPs in pending_approval or being asked about
 device_info = {}
 
 # --- SYSTEM INFO FUNCTION ---
@@ -26,30 +39,51 @@ def get_device_info():
         "storage_total": psutil.disk_usage('/').total
     }
 
-# --- BROADCAST ---
-def broadcast_presence():
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    message = b"TRUSTED_OS_DEVICE"
-    while True:
-        sock.sendto(message, ('<broadcast>', BROADCAST_PORT))
-        time.sleep(BROADCAST_INTERVAL)
+# --- DISCOVERY ---
+def on_peer_event(event, ip, port):
+    # Runs on the shared discovery thread, so never prompt here
+    if event == "removed":
+        known_devices.discard(ip)
+        peer_ports.pop(ip, None)
+        return
+    peer_ports[ip] = port
+    new = ip not in known_devices
+    known_devices.add(ip)
+    if new and ip not in approved_devices | denied_devices | awaiting_answer:
+        awaiting_answer.add(ip)
+        pending_approval.put(ip)
 
-def listen_for_broadcasts():
+def start_discovery():
+    discovery = get_discovery()
+    discovery.announce(SERVICE_DEVICE_INFO, CONNECT_PORT)
+    discovery.subscribe(SERVICE_DEVICE_INFO, on_peer_event)
+
+def listen_for_legacy_broadcasts():
+    """Older builds only broadcast TRUSTED_OS_DEVICE; they listen on CONNECT_PORT."""
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.bind(('', BROADCAST_PORT))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind(('', LEGACY_BROADCAST_PORT))
+    except OSError as e:
+        print(f"Not listening for legacy announcements: {e}")
+        return
     while True:
         data, addr = sock.recvfrom(1024)
-        ip = addr[0]
-        if data == b"TRUSTED_OS_DEVICE" and ip not in known_devices:
-            known_devices.add(ip)
-            # Prompt user for permission
-            approve = input(f"Device {ip} wants to collect your info. Approve? (y/n): ").lower()
-            if approve == "y":
-                approved_devices.add(ip)
-                print(f"Approved {ip} for info sharing.")
-            else:
-                print(f"Denied {ip}.")
+        if data == LEGACY_PRESENCE:
+            on_peer_event("seen", addr[0], CONNECT_PORT)  # Stale ones age out via evict_stale()
+
+def approve_devices():
+    while True:
+        ip = pending_approval.get()
+        # Prompt user for permission
+        approve = input(f"Device {ip} wants to collect your info. Approve? (y/n): ").lower()
+        if approve == "y":
+            approved_devices.add(ip)
+            print(f"Approved {ip} for info sharing.")
+        else:
+            denied_devices.add(ip)
+            print(f"Denied {ip}.")
+        awaiting_answer.discard(ip)
 
 # --- TCP SERVER ---
 def server():
@@ -68,19 +102,30 @@ def server():
 def send_info():
     while True:
         time.sleep(10)
-        for ip in list(approved_devices):
+        for ip in known_devices.evict_stale():
+            peer_ports.pop(ip, None)
+        # Only devices that are still around and not backing off after failures
+        for ip in known_devices.by_latency():
+            if ip not in approved_devices:
+                continue
             try:
-                client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                client.connect((ip, CONNECT_PORT))
+                start = time.monotonic()
+                port = peer_ports.get(ip, CONNECT_PORT)
+                client = socket.create_connection((ip, port), timeout=CONNECT_TIMEOUT)
+                # The TCP handshake takes one round trip
+                known_devices.record_rtt(ip, time.monotonic() - start)
                 client.sendall(json.dumps(get_device_info()).encode())
                 client.close()
+                known_devices.record_success(ip)
             except Exception as e:
+                known_devices.record_failure(ip)
                 print(f"Failed to send info to {ip}: {e}")
 
 # --- MAIN ---
 if __name__ == "__main__":
-    threading.Thread(target=broadcast_presence, daemon=True).start()
-    threading.Thread(target=listen_for_broadcasts, daemon=True).start()
+    start_discovery()
+    threading.Thread(target=listen_for_legacy_broadcasts, daemon=True).start()
+    threading.Thread(target=approve_devices, daemon=True).start()
     threading.Thread(target=server, daemon=True).start()
     threading.Thread(target=send_info, daemon=True).start()
 
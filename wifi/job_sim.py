@@ -0,0 +1,89 @@
+# job_sim.py
+# Harness for the background job API: nmcli is replaced by slow fakes and
+# the Flask app is driven through its test client. No root or nmcli needed.
+# Usage: python job_sim.py
+import json
+import threading
+import time
+
+import wifi_manager as wm
+from sim_common import check, api_client, run
+
+SLOW = 0.5  # Seconds each fake nmcli operation takes
+
+running = {}   # iface -> operations currently inside nmcli
+overlaps = []  # Interfaces that ran two operations at once
+lock = threading.Lock()
+
+def fake_op(iface, result):
+    with lock:
+        running[iface] = running.get(iface, 0) + 1
+        if running[iface] > 1:
+            overlaps.append(iface)
+    time.sleep(SLOW)
+    with lock:
+        running[iface] -= 1
+    return result
+
+def wait_done(client, headers, job_ids, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        states = [client.get(f"/api/jobs/{j}", headers=headers).get_json()["job"]["state"] for j in job_ids]
+        if all(s in wm.JOB_DONE_STATES for s in states):
+            return states
+        time.sleep(0.05)
+    return states
+
+def main():
+    wm.nmcli_connect = lambda ssid, password=None, profile_name=None: fake_op(wm.WIFI_IFACE, (True, f"joined {ssid}"))
+    wm.nmcli_create_hotspot = lambda ssid, password: fake_op(wm.WIFI_IFACE, (False, "device busy"))
+    wm.run_cmd = lambda cmd, timeout=20, shell=True: fake_op("eth0", (0, "wired:eth0", ""))
+    wm.has_nmcli = lambda: True
+    wm.get_public_ip = lambda: (True, "198.51.100.23")
+    wm.scan_cache.get = lambda fresh=False: {"networks": [], "age": 0, "refreshing": False, "error": None}
+    client, headers = api_client()
+    results = []
+
+    started = time.perf_counter()
+    replies = [client.post("/api/connect", json={"ssid": "Home"}, headers=headers),
+               client.post("/api/create_hotspot", json={"ssid": "AP", "password": "pass1234"}, headers=headers),
+               client.post("/api/set_static_ip", json={"iface": "eth0", "ip": "10.0.0.5/24", "gw": "10.0.0.1"},
+                           headers=headers)]
+    took = time.perf_counter() - started
+    results.append(check("long operations answer 202 at once",
+                         all(r.status_code == 202 for r in replies) and took < SLOW / 2, f"{took * 1000:.0f} ms"))
+    ids = [r.get_json()["job"]["id"] for r in replies]
+
+    started = time.perf_counter()
+    scan = client.get("/api/scan", headers=headers)
+    took = time.perf_counter() - started
+    results.append(check("reads are not blocked by running jobs", scan.status_code == 200 and took < 0.1,
+                         f"{took * 1000:.0f} ms"))
+
+    stream = client.get(f"/api/jobs/{ids[1]}/events?token={wm.API_TOKEN}")
+    events = [json.loads(line[len("data: "):]) for line in stream.get_data(as_text=True).splitlines()
+              if line.startswith("data: ")]
+    states = [e["state"] for e in events]
+    results.append(check("event stream follows the job to the end",
+                         states[0] == "queued" and "waiting" in states and states[-1] == "failed"
+                         and events[-1]["error"] == "device busy", " -> ".join(states)))
+
+    states = wait_done(client, headers, ids)
+    results.append(check("results are reported per job", states == ["succeeded", "failed", "succeeded"],
+                         ", ".join(states)))
+    job = client.get(f"/api/jobs/{ids[0]}", headers=headers).get_json()["job"]
+    results.append(check("connect result carries the internet check", job["result"]["internet"] is True))
+    results.append(check("jobs on one interface never overlap", not overlaps))
+
+    connect, hotspot, static = (client.get(f"/api/jobs/{j}", headers=headers).get_json()["job"] for j in ids)
+    results.append(check("jobs on different interfaces run side by side",
+                         static["started"] < connect["finished"] <= hotspot["started"]))
+
+    replies = [client.post("/api/connect", json={"ssid": f"n{i}"}, headers=headers)
+               for i in range(wm.JOB_MAX_PENDING + 2)]
+    codes = [r.status_code for r in replies]
+    results.append(check("queue is bounded", codes.count(202) == wm.JOB_MAX_PENDING and codes.count(503) == 2))
+    return all(results)
+
+if __name__ == "__main__":
+    run(main)
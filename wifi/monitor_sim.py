@@ -0,0 +1,95 @@
+# monitor_sim.py
+# Harness for NetworkState: drives the tracker from fake `ip monitor` /
+# `nmcli monitor` streams with the query helpers replaced by fakes, then
+# checks the model and times the memory-only API endpoints.
+# Usage: python monitor_sim.py
+import time
+
+import wifi_manager as wm
+from sim_common import check, api_client, run
+
+FAKE_QUERIES = {"ip": 0, "nm": 0, "connections": 0, "public_ip": 0}
+
+def fake_interfaces():
+    FAKE_QUERIES["ip"] += 1
+    return True, {"lo": {"addrs": ["127.0.0.1/8"]}, "wlan0": {"addrs": []}}
+
+def fake_ssid():
+    FAKE_QUERIES["nm"] += 1
+    return "HomeNet"
+
+def fake_connections():
+    FAKE_QUERIES["connections"] += 1
+    return True, [{"name": "HomeNet", "type": "802-11-wireless", "uuid": "1234"}]
+
+def fake_public_ip():
+    FAKE_QUERIES["public_ip"] += 1
+    return True, "203.0.113.7"
+
+IP_EVENTS = [
+    "3: wlan0    inet 192.168.1.50/24 brd 192.168.1.255 scope global dynamic wlan0\\       valid_lft 86399sec",
+    "3: wlan0    inet 10.0.0.9/8 scope global wlan0\\       valid_lft forever",
+    "Deleted 3: wlan0    inet 10.0.0.9/8 scope global wlan0\\       valid_lft forever",
+]
+NM_EVENTS = ["wlan0: connecting (getting IP configuration)", "wlan0: using connection 'HomeNet'",
+             "wlan0: connected", "Connectivity is now 'full'", "'HomeNet' is now the primary connection"]
+
+def main():
+    wm.get_local_interfaces = fake_interfaces
+    wm.get_active_ssid = fake_ssid
+    wm.get_connectivity = lambda: "full"  # What NetworkManager reports once the events below are done
+    wm.nmcli_list_connections = fake_connections
+    wm.get_public_ip = fake_public_ip
+    wm.has_nmcli = lambda: True
+
+    state = wm.net_state
+    state.start(streams={})            # Initial sync only
+    time.sleep(wm.RESYNC_DEBOUNCE + 0.2)
+    initial = dict(FAKE_QUERIES)
+    for line in IP_EVENTS:
+        state.feed("ip", line)
+    for line in NM_EVENTS:
+        state.feed("nm", line)
+    immediate = state.status()  # Before the debounced resync runs
+    time.sleep(wm.RESYNC_DEBOUNCE + 0.2)
+
+    status = state.status()
+    results = [
+        check("addresses applied straight from events", immediate["interfaces"]["wlan0"]["addrs"] == ["192.168.1.50/24"]),
+        check("connectivity applied straight from events", immediate["connectivity"] == "full" and immediate["internet"]),
+        check("active SSID re-queried", status["active_ssid"] == "HomeNet"),
+        check("event burst coalesced into one nm query", FAKE_QUERIES["nm"] - initial["nm"] == 1),
+        check("address events need no ip query", FAKE_QUERIES["ip"] == initial["ip"]),
+        check("public IP known", status["public_ip"] == "203.0.113.7"),
+    ]
+
+    # A network change during a slow probe must trigger another probe, not be dropped
+    answers = iter(["198.51.100.1", "198.51.100.2"])
+
+    def slow_public_ip():
+        time.sleep(0.3)
+        return True, next(answers, "198.51.100.2")
+    wm.get_public_ip = slow_public_ip
+    state._refresh_public_ip()
+    time.sleep(0.1)
+    state._refresh_public_ip()  # e.g. the route changed while the first probe ran
+    time.sleep(0.8)
+    results.append(check("change during a probe is re-probed", state.status()["public_ip"] == "198.51.100.2"
+                         and not state.public_ip_running))
+
+    client, headers = api_client()
+    for path in ("/api/status", "/api/interfaces", "/api/connections"):
+        client.get(path, headers=headers)  # Warm up
+        start = time.perf_counter()
+        for _ in range(200):
+            client.get(path, headers=headers)
+        per_call = (time.perf_counter() - start) / 200
+        print(f"      {path:<17} {per_call * 1e3:.3f} ms per request (Flask test client)")
+    start = time.perf_counter()
+    for _ in range(10000):
+        state.status()
+    print(f"      state.status()    {(time.perf_counter() - start) / 10000 * 1e6:.1f} us per read")
+    return all(results)
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,77 @@
+# probe_sim.py
+# Harness for PublicIpProber against local stand-in HTTP servers:
+# a fast endpoint, a slow one, a broken one and one answering with a
+# captive-portal style page. No real network access is needed.
+# Usage: python probe_sim.py
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import wifi_manager as wm
+from sim_common import check, timed, run
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    behaviour = ("ok", 0.0)   # (kind, delay)
+    connections = None        # Shared list of client ports seen
+
+    def do_GET(self):
+        kind, delay = self.behaviour
+        self.connections.add(self.client_address[1])
+        time.sleep(delay)
+        status, body = {"ok": (200, b"198.51.100.23\n"), "error": (500, b"oops"),
+                        "portal": (200, b"<html>Sign in to Wi-Fi</html>")}[kind]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def stand_in(kind, delay=0.0):
+    ports = set()
+    handler = type("Handler", (StandIn,), {"behaviour": (kind, delay), "connections": ports})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/", ports
+
+def main():
+    fast, fast_conns = stand_in("ok", 0.05)
+    slow, _ = stand_in("ok", 2.0)
+    broken, _ = stand_in("error")
+    portal, _ = stand_in("portal")
+    dead = "http://127.0.0.1:9/"  # Nothing listens on the discard port
+    results = []
+
+    prober = wm.PublicIpProber([slow, broken, portal, dead, fast], timeout=1.0, ttl=60, fail_ttl=5)
+    (ok, ip), took = timed(prober.get)
+    results.append(check("first valid answer wins the race", ok and ip == "198.51.100.23" and took < 0.5,
+                         f"{took * 1000:.0f} ms"))
+    (_, _), took = timed(prober.get)
+    results.append(check("second call served from cache", took < 0.001, f"{took * 1e6:.0f} us"))
+
+    prober.invalidate()
+    prober.get()
+    results.append(check("pooled session reuses the connection", len(fast_conns) == 1,
+                         f"{len(fast_conns)} connection(s) for 2 probes"))
+
+    prober.invalidate()
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(prober.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.append(check("concurrent callers share one probe", len(set(answers)) == 1 and len(answers) == 8))
+
+    offline = wm.PublicIpProber([broken, portal, dead, slow], timeout=1.0, ttl=60, fail_ttl=5)
+    (ok, _), took = timed(offline.get)
+    results.append(check("offline answer bounded by one timeout", not ok and took < 1.3, f"{took * 1000:.0f} ms"))
+    (ok, _), took = timed(offline.get)
+    results.append(check("offline answer cached", not ok and took < 0.001, f"{took * 1e6:.0f} us"))
+    return all(results)
+
+if __name__ == "__main__":
+    run(main)
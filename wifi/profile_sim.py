@@ -0,0 +1,99 @@
+# profile_sim.py
+# Harness for ProfileStore: concurrent writers, a reader watching the file,
+# outside edits and SSID lookups, all against a profiles file in a temp dir.
+# Usage: python profile_sim.py
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import wifi_manager as wm
+from sim_common import check, run
+
+WRITERS = 8
+WRITES = 25
+SCAN_SIZE = 40
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "wifi_profiles.json")
+    store = wm.ProfileStore(path)
+    results = []
+
+    # Writers race each other while a reader keeps parsing the file from disk
+    stop = threading.Event()
+    torn = []
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with open(path) as f:
+                    json.load(f)
+            except FileNotFoundError:
+                pass
+            except ValueError:
+                torn.append(1)
+
+    def writer(w):
+        for i in range(WRITES):
+            store.put(f"w{w}_{i}", {"ssid": f"net{w}", "password": "x" * 8, "updated": f"2026-01-01T00:00:{i:02d}"})
+
+    store.all()  # Creates the empty file
+    watcher = threading.Thread(target=reader)
+    watcher.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(WRITERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    took = time.perf_counter() - started
+    stop.set()
+    watcher.join()
+    with open(path) as f:
+        on_disk = json.load(f)
+    results.append(check("no concurrent update is lost", len(on_disk) == WRITERS * WRITES,
+                         f"{len(on_disk)} profiles, {WRITERS * WRITES / took:.0f} writes/s with fsync"))
+    results.append(check("readers never see a partial file", not torn))
+    results.append(check("no temp file left behind", not os.path.exists(path + ".tmp")))
+
+    results.append(check("lookup picks the newest profile for an SSID", store.for_ssid("net3")[0] == f"w3_{WRITES - 1}"))
+    networks = [{"ssid": f"stranger{i}", "signal": str(99 - i)} for i in range(SCAN_SIZE)]
+    networks.insert(SCAN_SIZE // 2, {"ssid": "net5", "signal": "60"})
+    networks.append({"ssid": "net1", "signal": "20"})
+    best = store.best_for(networks)
+    results.append(check("auto-connect choice is the strongest known network", best and best[2]["ssid"] == "net5"))
+
+    reads = 2000
+    started = time.perf_counter()
+    for _ in range(reads):
+        store.get("w0_0")
+    cached = (time.perf_counter() - started) / reads
+    started = time.perf_counter()
+    for _ in range(reads // 10):
+        with open(path) as f:
+            json.load(f)
+    parsed = (time.perf_counter() - started) / (reads // 10)
+    results.append(check("cached read beats re-parsing the file", cached < parsed,
+                         f"{cached * 1e6:.0f} us vs {parsed * 1e6:.0f} us per read"))
+
+    with open(path, "w") as f:
+        json.dump({"edited": {"ssid": "net5", "password": "changed1", "updated": "2026-02-01T00:00:00"}}, f)
+    results.append(check("outside edits are picked up", list(store.all()) == ["edited"]
+                         and store.best_for(networks)[0] == "edited"))
+
+    with open(path, "w") as f:
+        f.write("{ not json")
+    results.append(check("a broken file keeps the last good profiles", list(store.all()) == ["edited"]))
+    with open(path, "w") as f:
+        json.dump({"legacy": "just-a-password", "odd": {"ssid": ["x"], "updated": 5},
+                   "good": {"ssid": "net9", "password": "pw123456"}}, f)
+    results.append(check("entries that aren't profiles are skipped", sorted(store.all()) == ["good", "odd"]
+                         and store.for_ssid("net9")[0] == "good"))
+    store.put("edited", {"ssid": "net5", "password": "changed1"})
+    results.append(check("delete reports missing profiles", store.delete("edited") and not store.delete("edited")))
+    return all(results)
+
+if __name__ == "__main__":
+    run(main, logging.CRITICAL)  # The broken-file case logs a traceback on purpose
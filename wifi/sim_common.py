@@ -0,0 +1,28 @@
+# sim_common.py
+# Shared scaffolding for the wifi_manager harnesses (*_sim.py): PASS/FAIL
+# reporting, timing, an authorised Flask test client and the entry point.
+import logging
+import sys
+import time
+
+import wifi_manager as wm
+
+def check(name, ok, detail=""):
+    """Print one PASS/FAIL line and return ok, so callers can collect results."""
+    print(f"{'PASS' if ok else 'FAIL'}  {name}{'  (' + detail + ')' if detail else ''}")
+    return ok
+
+def timed(fn):
+    """(fn(), seconds it took)."""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def api_client():
+    """Flask test client for the manager's API and the headers that authorise it."""
+    return wm.app.test_client(), {"X-API-Token": wm.API_TOKEN}
+
+def run(main, log_level=logging.WARNING):
+    """Quiet the manager's log, run main() and exit non-zero unless it returned True."""
+    wm.logger.setLevel(log_level)
+    sys.exit(0 if main() else 1)
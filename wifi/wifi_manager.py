@@ -15,28 +15,38 @@ Run:
   sudo python3 wifi_manager_big.py
 
 API:
-  GET  /api/scan                 -> scan networks
-  POST /api/connect              -> {"ssid":"...","password":"...","profile_name":"opt"}
+  GET  /api/scan                 -> cached scan results with their age (?fresh=1 waits for a new scan)
+  POST /api/connect              -> {"ssid":"...","password":"...","profile_name":"opt"} (job)
   POST /api/disconnect           -> {"profile":"..."} (or active)
   GET  /api/status               -> internet/local IP/active
-  GET  /api/public_ip            -> external/public IP (requests to icanhazip)
-  POST /api/set_static_ip        -> {"iface":"wlan0","ip":"192.168.1.50/24","gw":"192.168.1.1","dns":["8.8.8.8"]}
-  POST /api/create_hotspot       -> {"ssid":"MyAP","password":"pass1234"}
+  GET  /api/public_ip            -> external/public IP (cached; endpoints raced concurrently)
+  POST /api/set_static_ip        -> {"iface":"wlan0","ip":"192.168.1.50/24","gw":"192.168.1.1","dns":["8.8.8.8"]} (job)
+  POST /api/create_hotspot       -> {"ssid":"MyAP","password":"pass1234"} (job)
   POST /api/delete_hotspot       -> {}
   GET  /api/profiles             -> list saved profiles
   POST /api/profiles             -> {"name":"pname","ssid":"...","password":"...","type":"wifi"}
   DELETE /api/profiles/<name>    -> remove saved profile
+  POST /api/auto_connect         -> {"fresh": false} connect to the strongest network with a saved profile (job)
   GET  /api/interfaces           -> list network interfaces and addresses
   GET  /api/logs                 -> last lines of log
+  GET  /api/jobs                 -> recent jobs
+  GET  /api/jobs/<id>            -> job state, progress messages and result
+  GET  /api/jobs/<id>/events     -> server-sent events for a job until it finishes
+
+Jobs: operations marked (job) answer 202 with {"job": {...}} at once and
+run in the background; poll /api/jobs/<id> or follow its event stream.
 
 Security:
  - Basic token auth via header "X-API-Token: <token>". Token generated at first run and saved as `api_token.txt`.
 """
 
-import os, sys, json, subprocess, shutil, time, socket, threading, logging, datetime
-from flask import Flask, request, jsonify, abort
+import os, sys, json, subprocess, shutil, time, socket, threading, logging, datetime, re, ipaddress
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from flask import Flask, request, jsonify, abort, Response, stream_with_context
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
 
 # -----------------------
 # Config & paths
@@ -49,6 +59,22 @@ API_TOKEN_FILE = os.path.join(BASE_DIR, "api_token.txt")
 FLASK_HOST = "0.0.0.0"
 FLASK_PORT = 5002
 
+SCAN_MAX_AGE = 30        # Seconds before cached scan results trigger a background rescan
+SCAN_WAIT_TIMEOUT = 15   # Max seconds a ?fresh=1 request waits for the scan
+RESYNC_DEBOUNCE = 0.3    # Seconds to let a burst of network events settle before re-querying
+MONITOR_RESTART_DELAY = 5
+
+PUBLIC_IP_ENDPOINTS = ["https://icanhazip.com", "https://ifconfig.me/ip", "https://api.ipify.org"]
+PUBLIC_IP_TIMEOUT = 4    # Seconds for the whole race, not per endpoint
+PUBLIC_IP_TTL = 300      # Seconds a found public IP is trusted (network events invalidate it sooner)
+PUBLIC_IP_FAIL_TTL = 15  # Seconds an "offline" answer is trusted
+
+WIFI_IFACE = "wlan0"     # Interface used by connect and hotspot jobs
+JOB_WORKERS = 2          # Long nmcli operations running at once
+JOB_MAX_PENDING = 8      # Queued + running jobs before new ones are refused
+JOB_KEEP = 50            # Finished jobs kept for /api/jobs/<id>
+JOB_STREAM_KEEPALIVE = 15  # Seconds between keepalive comments on an idle event stream
+
 # -----------------------
 # Logging
 # -----------------------
@@ -77,24 +103,6 @@ def run_cmd(cmd, timeout=20, shell=True):
         logger.warning(f"Command timeout: {cmd}")
         return 124, "", "timeout"
 
-def ensure_profiles():
-    if not os.path.exists(PROFILES_FILE):
-        with open(PROFILES_FILE, "w") as f:
-            json.dump({}, f, indent=2)
-
-def load_profiles():
-    ensure_profiles()
-    try:
-        with open(PROFILES_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.exception("Failed to load profiles")
-        return {}
-
-def save_profiles(p):
-    with open(PROFILES_FILE, "w") as f:
-        json.dump(p, f, indent=2)
-
 def generate_token_if_missing():
     if not os.path.exists(API_TOKEN_FILE):
         token = os.urandom(16).hex()
@@ -112,6 +120,130 @@ logger.info(f"API token: {API_TOKEN} (store securely)")
 def has_nmcli():
     return shutil.which("nmcli") is not None
 
+# -----------------------
+# Profile store
+# -----------------------
+class ProfileStore:
+    """
+    wifi_profiles.json held in memory. Reads cost one stat() to notice edits
+    made outside the server (the file is reloaded when its mtime or size
+    changes). Changes are applied under the lock and written to a temp file,
+    fsynced and renamed over the original, so concurrent requests never lose
+    each other's updates and a crash never leaves a truncated file.
+    """
+
+    def __init__(self, path=PROFILES_FILE):
+        self.path = path
+        self.profiles = {}
+        self.by_ssid = {}  # ssid -> name of the newest profile for it
+        self.stamp = None  # (mtime_ns, size) of the file as last read or written
+        self.lock = threading.Lock()
+
+    # --- reads ---
+    def all(self):
+        with self.lock:
+            self._reload_if_changed()
+            return {name: dict(p) for name, p in self.profiles.items()}
+
+    def get(self, name):
+        with self.lock:
+            self._reload_if_changed()
+            p = self.profiles.get(name)
+            return None if p is None else dict(p)
+
+    def for_ssid(self, ssid):
+        """(name, profile) of the best saved profile for ssid, or None."""
+        with self.lock:
+            self._reload_if_changed()
+            name = self.by_ssid.get(ssid)
+            return None if name is None else (name, dict(self.profiles[name]))
+
+    def best_for(self, networks):
+        """(name, profile, network) for the first network with a saved profile; pass networks strongest first."""
+        with self.lock:
+            self._reload_if_changed()
+            for net in networks:
+                name = self.by_ssid.get(net.get("ssid"))
+                if name is not None:
+                    return name, dict(self.profiles[name]), net
+        return None
+
+    # --- changes ---
+    def put(self, name, profile):
+        with self.lock:
+            self._reload_if_changed()
+            self._write({**self.profiles, name: profile})
+            return dict(profile)
+
+    def delete(self, name):
+        """Remove name; returns False if there was no such profile."""
+        with self.lock:
+            self._reload_if_changed()
+            if name not in self.profiles:
+                return False
+            self._write({k: v for k, v in self.profiles.items() if k != name})
+            return True
+
+    # --- helpers (call with self.lock held) ---
+    def _reload_if_changed(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._write({})
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self.stamp:
+            return
+        self.stamp = stamp  # Even if parsing fails: don't retry (and log) on every request
+        try:
+            with open(self.path, "r") as f:
+                profiles = json.load(f)
+            if not isinstance(profiles, dict):
+                raise ValueError("profiles file must hold a JSON object")
+        except (OSError, ValueError):
+            logger.exception("Failed to load profiles; keeping the previous ones")
+            return
+        self._set(profiles)
+
+    def _write(self, profiles):
+        """Persist atomically, then swap the in-memory copy; raises OSError if the write fails."""
+        temp_file = f"{self.path}.tmp"
+        try:
+            with open(temp_file, "w") as f:
+                json.dump(profiles, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.path)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        try:
+            dir_fd = os.open(os.path.dirname(self.path) or ".", os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)  # Make the rename itself durable
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+        st = os.stat(self.path)
+        self.stamp = (st.st_mtime_ns, st.st_size)
+        self._set(profiles)
+
+    def _set(self, profiles):
+        bad = [name for name, p in profiles.items() if not isinstance(p, dict)]
+        if bad:
+            logger.warning(f"Ignoring profiles that are not objects: {', '.join(map(str, bad))}")
+            profiles = {name: p for name, p in profiles.items() if isinstance(p, dict)}
+        self.profiles = profiles
+        by_ssid = {}
+        # Newest (by updated/created timestamp) wins when several profiles share an SSID
+        for name, p in sorted(profiles.items(), key=lambda kv: str(kv[1].get("updated") or kv[1].get("created") or "")):
+            if isinstance(p.get("ssid"), str) and p["ssid"]:
+                by_ssid[p["ssid"]] = name
+        self.by_ssid = by_ssid
+
+profile_store = ProfileStore()
+
 # -----------------------
 # Network functions (nmcli-centered)
 # -----------------------
@@ -211,7 +343,7 @@ def nmcli_create_hotspot(ssid, password):
     # password must be >= 8 for WPA2
     if not password or len(password) < 8:
         return False, "hotspot password must be >= 8 chars"
-    cmd = f"nmcli device wifi hotspot ifname wlan0 ssid \"{ssid}\" password \"{password}\""
+    cmd = f"nmcli device wifi hotspot ifname {WIFI_IFACE} ssid \"{ssid}\" password \"{password}\""
     rc, out, err = run_cmd(cmd, timeout=10)
     if rc == 0:
         return True, out
@@ -232,6 +364,75 @@ def nmcli_delete_hotspot():
                 deleted.append(c["name"])
     return True, deleted
 
+# -----------------------
+# Scan cache
+# -----------------------
+def sort_networks(nets):
+    """Drop hidden/empty SSIDs and order by signal, strongest first."""
+    nets = [n for n in nets if n.get("ssid")]
+    nets.sort(key=lambda x: int(x["signal"]) if str(x.get("signal", "")).isdigit() else 0, reverse=True)
+    return nets
+
+class ScanCache:
+    """
+    Last scan result plus one refresher thread. Requests never scan
+    themselves: stale results are served at once while a rescan is requested,
+    and any number of concurrent requests share the same in-flight scan.
+    """
+
+    def __init__(self, scan, max_age=SCAN_MAX_AGE):
+        self.scan = scan
+        self.max_age = max_age
+        self.networks = None    # Last successful result
+        self.error = None       # Error of the last scan, if it failed
+        self.updated = None     # time.monotonic() of the last successful scan
+        self.generation = 0     # Completed scans, successful or not
+        self.scanning = False
+        self.wanted = False
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True, name="wifi-scan").start()
+
+    def get(self, fresh=False, timeout=SCAN_WAIT_TIMEOUT):
+        """Return a snapshot; with fresh=True (or no data yet) wait for the in-flight or next scan."""
+        with self.cond:
+            seen = self.generation
+            if fresh or self.updated is None or time.monotonic() - self.updated > self.max_age:
+                if not self.scanning:
+                    self.wanted = True
+                    self.cond.notify_all()
+            if fresh or self.updated is None:
+                self.cond.wait_for(lambda: self.generation > seen, timeout)
+            return {
+                "networks": self.networks,
+                "age": None if self.updated is None else round(time.monotonic() - self.updated, 1),
+                "refreshing": self.scanning or self.wanted,
+                "error": self.error,
+            }
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.wanted)
+                self.wanted = False
+                self.scanning = True
+            try:
+                ok, data = self.scan()
+            except Exception as e:
+                logger.exception("Background scan failed")
+                ok, data = False, str(e)
+            with self.cond:
+                if ok:
+                    self.networks = sort_networks(data)
+                    self.updated = time.monotonic()
+                    self.error = None
+                else:
+                    self.error = data
+                self.scanning = False
+                self.generation += 1
+                self.cond.notify_all()
+
+scan_cache = ScanCache(nmcli_scan)
+
 # -----------------------
 # IP & status helpers
 # -----------------------
@@ -258,17 +459,454 @@ def get_local_interfaces():
                 interfaces[current_iface]["addrs"].append(ipmask)
     return True, interfaces
 
+class PublicIpProber:
+    """
+    Races every endpoint at once over one pooled requests.Session and takes
+    the first valid answer. Results are cached (failures for less time);
+    invalidate() drops the cache when the network changes. Concurrent
+    callers share a single probe.
+    """
+
+    def __init__(self, endpoints=PUBLIC_IP_ENDPOINTS, timeout=PUBLIC_IP_TIMEOUT,
+                 ttl=PUBLIC_IP_TTL, fail_ttl=PUBLIC_IP_FAIL_TTL):
+        self.endpoints = list(endpoints)
+        self.timeout = timeout
+        self.ttl = ttl
+        self.fail_ttl = fail_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=4)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool = ThreadPoolExecutor(max_workers=len(self.endpoints) * 2, thread_name_prefix="ip-probe")
+        self.lock = threading.Lock()
+        self.result = None      # (ok, ip or "failed")
+        self.expires = 0.0
+        self.inflight = None    # [Event set when done, result] of the running probe
+        self.generation = 0     # Bumped by invalidate() so a stale probe cannot refill the cache
+
+    def invalidate(self):
+        with self.lock:
+            self.result = None
+            self.generation += 1
+
+    def get(self):
+        """(ok, public ip) from cache, or from a probe shared with concurrent callers."""
+        with self.lock:
+            if self.result is not None and time.monotonic() < self.expires:
+                return self.result
+            shared = self.inflight
+            if shared is None:
+                shared = self.inflight = [threading.Event(), (False, "failed")]
+                generation = self.generation
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            shared[0].wait(self.timeout + 1)
+            return shared[1]
+        try:
+            shared[1] = self.probe()
+        finally:
+            with self.lock:
+                if generation == self.generation:  # No network change while probing
+                    self.result = shared[1]
+                    self.expires = time.monotonic() + (self.ttl if shared[1][0] else self.fail_ttl)
+                self.inflight = None
+            shared[0].set()
+        return shared[1]
+
+    def _fetch(self, url):
+        r = self.session.get(url, timeout=self.timeout)
+        r.raise_for_status()
+        ip = r.text.strip()
+        ipaddress.ip_address(ip)  # Rejects captive-portal pages and other junk
+        return ip
+
+    def probe(self):
+        """Race all endpoints; (True, ip) from the first valid answer or (False, "failed")."""
+        futures = {self.pool.submit(self._fetch, url): url for url in self.endpoints}
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                try:
+                    return True, future.result()
+                except Exception as e:
+                    logger.debug(f"Public IP check failed for {futures[future]}: {e}")
+        except FuturesTimeout:
+            logger.debug("Public IP probe timed out")
+        return False, "failed"
+
+public_ip_prober = PublicIpProber()
+
 def get_public_ip():
-    # try several services
-    services = ["https://icanhazip.com", "https://ifconfig.me/ip", "https://api.ipify.org"]
-    for url in services:
+    return public_ip_prober.get()
+
+def get_active_ssid():
+    if not has_nmcli():
+        return None
+    rc, out, err = run_cmd("nmcli -t -f ACTIVE,SSID dev wifi | egrep '^yes' || true", timeout=3)
+    if rc == 0 and out:
+        parts = out.split(":")
+        if len(parts) >= 2:
+            return parts[1]
+    return None
+
+def get_connectivity():
+    """NetworkManager's verdict: none, portal, limited, full or unknown."""
+    if not has_nmcli():
+        return "unknown"
+    rc, out, err = run_cmd("nmcli networking connectivity", timeout=3)
+    return out if rc == 0 and out else "unknown"
+
+# -----------------------
+# Network state tracker
+# -----------------------
+# `ip monitor` and `nmcli monitor` run for the life of the server. Address
+# events are applied to the model directly; every other event marks part of
+# the model dirty, and one resync thread re-queries just that part after a
+# short debounce, so a burst of events costs one query. API handlers only
+# read the model.
+IP_ADDR_EVENT = re.compile(r"^(Deleted )?\d+:\s+(\S+)\s+inet\s+(\S+)")
+NM_CONNECTIVITY_EVENT = re.compile(r"Connectivity is now '(\w+)'")
+
+class NetworkState:
+    def __init__(self):
+        self.interfaces = {}       # Same shape as get_local_interfaces()
+        self.active_ssid = None
+        self.connectivity = "unknown"
+        self.connections = []
+        self.public_ip = None
+        self.updated = None
+        self.dirty = set()         # Parts to re-query: "ip", "nm", "connections", "public_ip"
+        self.cond = threading.Condition()
+        self.public_ip_running = False
+        self.public_ip_pending = False  # A change arrived that the running probe hasn't seen
+
+    # --- reads (memory only) ---
+    def status(self):
+        with self.cond:
+            internet = self.connectivity == "full" if self.connectivity != "unknown" else self.public_ip is not None
+            return {"internet": internet, "public_ip": self.public_ip,
+                    "interfaces": self.get_interfaces(),  # Condition's lock is re-entrant
+                    "active_ssid": self.active_ssid, "connectivity": self.connectivity,
+                    "age": None if self.updated is None else round(time.monotonic() - self.updated, 1)}
+
+    def get_interfaces(self):
+        with self.cond:
+            return {name: {"addrs": list(info["addrs"])} for name, info in self.interfaces.items()}
+
+    def get_connections(self):
+        with self.cond:
+            return [dict(c) for c in self.connections]
+
+    # --- events ---
+    def feed(self, source, line):
+        """Apply one line of `ip -o monitor` ("ip") or `nmcli monitor` ("nm") output."""
+        line = line.strip()
+        if not line:
+            return
+        with self.cond:
+            if source == "ip":
+                m = IP_ADDR_EVENT.match(line)
+                if m:
+                    deleted, iface, addr = m.groups()
+                    addrs = self.interfaces.setdefault(iface, {"addrs": []})["addrs"]
+                    if deleted and addr in addrs:
+                        addrs.remove(addr)
+                    elif not deleted and addr not in addrs:
+                        addrs.append(addr)
+                    self.updated = time.monotonic()
+                    self.dirty.add("public_ip")
+                else:
+                    self.dirty.add("ip")  # Link added/removed: re-list interfaces
+            else:
+                m = NM_CONNECTIVITY_EVENT.search(line)
+                if m:
+                    if m.group(1) != self.connectivity:
+                        self.connectivity = m.group(1)
+                        self.dirty.add("public_ip")
+                    self.updated = time.monotonic()
+                elif "connection" in line.lower() and ("added" in line or "removed" in line):
+                    self.dirty.add("connections")
+                else:
+                    self.dirty.add("nm")  # Device state / active connection changed
+            self.cond.notify_all()
+
+    def mark_dirty(self, *parts):
+        with self.cond:
+            self.dirty.update(parts)
+            self.cond.notify_all()
+
+    # --- background work ---
+    def _resync_loop(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.dirty)
+            time.sleep(RESYNC_DEBOUNCE)  # Coalesce the rest of the burst
+            with self.cond:
+                parts, self.dirty = self.dirty, set()
+            if "ip" in parts:
+                ok, ifs = get_local_interfaces()
+                if ok:
+                    with self.cond:
+                        self.interfaces = ifs
+            if "nm" in parts:
+                ssid, connectivity = get_active_ssid(), get_connectivity()
+                with self.cond:
+                    self.active_ssid = ssid
+                    if connectivity != self.connectivity:
+                        self.connectivity = connectivity
+                        parts.add("public_ip")
+            if "connections" in parts or "nm" in parts:
+                ok, conns = nmcli_list_connections()
+                if ok:
+                    with self.cond:
+                        self.connections = conns
+            if "public_ip" in parts:
+                self._refresh_public_ip()
+            with self.cond:
+                self.updated = time.monotonic()
+
+    def _refresh_public_ip(self):
+        # Can take seconds when offline; never hold up the other parts of the model
+        with self.cond:
+            self.public_ip_pending = True
+            if self.public_ip_running:
+                return  # The running probe goes round again when it finishes
+            self.public_ip_running = True
+
+        def work():
+            while True:
+                with self.cond:
+                    if not self.public_ip_pending:
+                        self.public_ip_running = False
+                        return
+                    self.public_ip_pending = False
+                public_ip_prober.invalidate()  # Only called when addresses or connectivity changed
+                ok, ip = get_public_ip()
+                with self.cond:
+                    self.public_ip = ip if ok else None
+        threading.Thread(target=work, daemon=True).start()
+
+    def _follow(self, source, argv):
+        """Feed a monitor command's output forever, restarting it if it exits."""
+        while True:
+            try:
+                proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+                logger.info(f"Network monitor started: {' '.join(argv)}")
+                for line in proc.stdout:
+                    self.feed(source, line)
+                proc.wait()
+                logger.warning(f"Network monitor exited (rc={proc.returncode}): {' '.join(argv)}")
+            except OSError as e:
+                logger.warning(f"Network monitor failed to start: {' '.join(argv)}: {e}")
+            self.mark_dirty("ip" if source == "ip" else "nm")  # Events may have been missed
+            time.sleep(MONITOR_RESTART_DELAY)
+
+    def _replay(self, source, lines):
+        for line in lines:
+            self.feed(source, line)
+
+    def start(self, streams=None):
+        """
+        Start tracking. streams maps "ip"/"nm" to an iterable of monitor lines
+        (e.g. a fake stream in a test harness); by default the real monitors run.
+        """
+        self.mark_dirty("ip", "nm", "connections", "public_ip")
+        threading.Thread(target=self._resync_loop, daemon=True, name="net-resync").start()
+        if streams is None:
+            streams = {}
+            if shutil.which("ip"):
+                threading.Thread(target=self._follow, args=("ip", ["ip", "-o", "-4", "monitor", "link", "address"]),
+                                 daemon=True, name="ip-monitor").start()
+            if has_nmcli():
+                threading.Thread(target=self._follow, args=("nm", ["nmcli", "monitor"]),
+                                 daemon=True, name="nm-monitor").start()
+        for source, lines in streams.items():
+            threading.Thread(target=self._replay, args=(source, lines), daemon=True).start()
+        return self
+
+net_state = NetworkState()
+
+# -----------------------
+# Background jobs
+# -----------------------
+# connect, set_static_ip and create_hotspot can keep nmcli busy for tens of
+# seconds, so they run on a small pool instead of in the request. Jobs on
+# the same interface run one at a time: while one is running the others
+# wait in that interface's queue (not in a pool thread), and each finished
+# job hands the pool the next. Scans, status and other reads never wait.
+JOB_DONE_STATES = ("succeeded", "failed")
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, keep=JOB_KEEP):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.max_pending = max_pending
+        self.keep = keep
+        self.jobs = {}         # id -> job, oldest first
+        self.waiting = {}      # iface -> deque of (job, fn, args); present while a job on iface runs
+        self.cond = threading.Condition()
+
+    def submit(self, kind, iface, fn, *args):
+        """
+        Queue fn(progress, *args), which returns (ok, result dict or error).
+        Returns the job snapshot, or None when too many jobs are pending.
+        """
+        with self.cond:
+            pending = sum(1 for j in self.jobs.values() if j["state"] not in JOB_DONE_STATES)
+            if pending >= self.max_pending:
+                return None
+            job = {"id": os.urandom(6).hex(), "kind": kind, "iface": iface, "state": "queued",
+                   "events": [], "result": None, "error": None,
+                   "created": time.time(), "started": None, "finished": None}
+            self.jobs[job["id"]] = job
+            self._event(job, "queued", f"{kind} queued")
+            if iface in self.waiting:
+                self.waiting[iface].append((job, fn, args))
+                self._event(job, "waiting", f"waiting for another job on {iface}")
+            else:
+                self.waiting[iface] = deque()
+                self.pool.submit(self._run, job, fn, args)
+            self._trim()
+            return self._snapshot(job)
+
+    def get(self, job_id):
+        with self.cond:
+            job = self.jobs.get(job_id)
+            return None if job is None else self._snapshot(job)
+
+    def recent(self):
+        with self.cond:
+            return [self._snapshot(j, events=False) for j in self.jobs.values()]
+
+    def follow(self, job_id, keepalive=JOB_STREAM_KEEPALIVE):
+        """Yield the job's events as they happen (None while idle), ending once it finishes."""
+        seen = 0
+        while True:
+            with self.cond:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    return
+                if seen == len(job["events"]) and job["state"] not in JOB_DONE_STATES:
+                    self.cond.wait(keepalive)
+                new = job["events"][seen:]
+                seen += len(new)
+                done = job["state"] in JOB_DONE_STATES and seen == len(job["events"])
+            if not new:
+                yield None
+            for event in new:
+                yield event
+            if done:
+                return
+
+    # --- worker side ---
+    def _run(self, job, fn, args):
+        with self.cond:
+            job["started"] = time.time()
+            self._event(job, "running", f"{job['kind']} started")
+
+        def progress(message):
+            with self.cond:
+                self._event(job, "running", message)
         try:
-            r = requests.get(url, timeout=4)
-            if r.status_code == 200:
-                return True, r.text.strip()
+            ok, result = fn(progress, *args)
         except Exception as e:
-            logger.debug(f"Public IP check failed for {url}: {e}")
-    return False, "failed"
+            logger.exception(f"Job {job['id']} ({job['kind']}) crashed")
+            ok, result = False, str(e)
+        with self.cond:
+            job["finished"] = time.time()
+            if ok:
+                job["result"] = result
+                self._event(job, "succeeded", f"{job['kind']} done", result=result)
+            else:
+                job["error"] = result
+                self._event(job, "failed", f"{job['kind']} failed", error=result)
+            logger.info(f"Job {job['id']} ({job['kind']} on {job['iface']}): {job['state']}")
+            queue = self.waiting[job["iface"]]
+            if queue:
+                self.pool.submit(self._run, *queue.popleft())
+            else:
+                del self.waiting[job["iface"]]
+
+    # --- helpers (call with self.cond held) ---
+    def _event(self, job, state, message, **extra):
+        job["state"] = state
+        job["events"].append({"time": time.time(), "state": state, "message": message, **extra})
+        self.cond.notify_all()
+
+    def _trim(self):
+        finished = [j["id"] for j in self.jobs.values() if j["state"] in JOB_DONE_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self.jobs[job_id]
+
+    def _snapshot(self, job, events=True):
+        snap = {k: v for k, v in job.items() if k != "events"}
+        snap["progress"] = job["events"][-1]["message"] if job["events"] else None
+        if events:
+            snap["events"] = list(job["events"])
+        return snap
+
+jobs = JobManager()
+
+def connect_job(progress, ssid, password, profile_name, save_profile):
+    progress(f"connecting to {ssid}")
+    ok, out = nmcli_connect(ssid, password, profile_name)
+    if not ok:
+        return False, out
+    if save_profile:
+        pname = profile_name or f"profile_{ssid}"
+        try:
+            profile_store.put(pname, {"ssid": ssid, "password": password,
+                                      "created": datetime.datetime.utcnow().isoformat()})
+        except OSError as e:
+            logger.warning(f"Saving profile {pname} failed: {e}")
+    # check internet; the connect just changed the network, so skip the cache
+    progress("checking internet access")
+    public_ip_prober.invalidate()
+    inet_ok, _ = get_public_ip()
+    return True, {"message": out, "internet": inet_ok}
+
+def static_ip_job(progress, iface, ip, gw, dns):
+    # modify connection for the given interface - find a connection bound to iface
+    rc, out, err = run_cmd(f"nmcli -t -f NAME,DEVICE connection show --active | egrep ':{iface}$' || true", timeout=4)
+    conn_name = None
+    if rc == 0 and out:
+        conn_name = out.split(":")[0]
+    else:
+        # fallback choose any wifi connection or create a temp one
+        ok, conns = nmcli_list_connections()
+        if ok and conns:
+            conn_name = conns[0]["name"]
+    if not conn_name:
+        return False, "no connection found for iface"
+    # set ipv4.method manual and address/gateway/dns
+    progress(f"setting {ip} via {gw} on {conn_name}")
+    cmd = f"nmcli connection modify \"{conn_name}\" ipv4.method manual ipv4.addresses {ip} ipv4.gateway {gw}"
+    rc, out, err = run_cmd(cmd, timeout=6)
+    if rc != 0:
+        return False, err or out
+    if dns:
+        dns_str = ",".join(dns)
+        rc2, out2, err2 = run_cmd(f"nmcli connection modify \"{conn_name}\" ipv4.dns \"{dns_str}\"", timeout=6)
+        if rc2 != 0:
+            logger.warning("Setting DNS failed: " + (err2 or out2))
+    # bring connection down & up
+    progress(f"restarting {conn_name}")
+    run_cmd(f"nmcli connection down \"{conn_name}\"", timeout=5)
+    rc3, out3, err3 = run_cmd(f"nmcli connection up \"{conn_name}\"", timeout=8)
+    if rc3 == 0:
+        return True, {"message": out3}
+    else:
+        return False, err3 or out3
+
+def hotspot_job(progress, ssid, password):
+    progress(f"starting hotspot {ssid}")
+    ok, out = nmcli_create_hotspot(ssid, password)
+    return (True, {"message": out}) if ok else (False, out)
+
+def job_accepted(snap):
+    if snap is None:
+        return jsonify({"success": False, "error": "too many jobs pending"}), 503
+    return jsonify({"success": True, "job": snap}), 202
 
 # -----------------------
 # Flask API
@@ -289,39 +927,21 @@ def require_token(fn):
 @app.route("/api/scan", methods=["GET"])
 @require_token
 def api_scan():
-    ok, data = nmcli_scan()
-    if not ok:
-        return jsonify({"success": False, "error": data}), 500
-    # filter duplicate empty SSIDs and sort by signal (if present)
-    nets = [n for n in data if n.get("ssid")]
-    try:
-        nets.sort(key=lambda x: int(x.get("signal") or 0), reverse=True)
-    except:
-        pass
-    return jsonify({"success": True, "networks": nets})
+    snap = scan_cache.get(fresh=request.args.get("fresh") == "1")
+    if snap["networks"] is None:
+        return jsonify({"success": False, "error": snap["error"] or "scan timed out"}), 500
+    return jsonify({"success": True, "networks": snap["networks"], "age": snap["age"],
+                    "refreshing": snap["refreshing"], "error": snap["error"]})
 
 @app.route("/api/connect", methods=["POST"])
 @require_token
 def api_connect():
     d = request.json or {}
     ssid = d.get("ssid")
-    password = d.get("password")
-    profile_name = d.get("profile_name")
     if not ssid:
         return jsonify({"success": False, "error": "ssid required"}), 400
-    ok, out = nmcli_connect(ssid, password, profile_name)
-    if ok:
-        # optionally save profile
-        if d.get("save_profile"):
-            profs = load_profiles()
-            pname = profile_name or f"profile_{ssid}"
-            profs[pname] = {"ssid": ssid, "password": password, "created": datetime.datetime.utcnow().isoformat()}
-            save_profiles(profs)
-        # check internet
-        inet_ok, _ = get_public_ip()
-        return jsonify({"success": True, "message": out, "internet": inet_ok})
-    else:
-        return jsonify({"success": False, "error": out}), 500
+    return job_accepted(jobs.submit("connect", WIFI_IFACE, connect_job, ssid, d.get("password"),
+                                    d.get("profile_name"), d.get("save_profile")))
 
 @app.route("/api/disconnect", methods=["POST"])
 @require_token
@@ -337,16 +957,7 @@ def api_disconnect():
 @app.route("/api/status", methods=["GET"])
 @require_token
 def api_status():
-    inet_ok, pub = get_public_ip()
-    lok, ifs = get_local_interfaces()
-    active = None
-    if has_nmcli():
-        rc, out, err = run_cmd("nmcli -t -f ACTIVE,SSID dev wifi | egrep '^yes' || true", timeout=3)
-        if rc == 0 and out:
-            parts = out.split(":")
-            if len(parts) >= 2:
-                active = parts[1]
-    return jsonify({"success": True, "internet": inet_ok, "public_ip": pub if inet_ok else None, "interfaces": ifs if lok else {}, "active_ssid": active})
+    return jsonify({"success": True, **net_state.status()})
 
 @app.route("/api/public_ip", methods=["GET"])
 @require_token
@@ -369,35 +980,7 @@ def api_set_static_ip():
         return jsonify({"success": False, "error": "iface, ip and gw required"}), 400
     if not has_nmcli():
         return jsonify({"success": False, "error": "nmcli not found"}), 500
-    # modify connection for the given interface - find a connection bound to iface
-    rc, out, err = run_cmd(f"nmcli -t -f NAME,DEVICE connection show --active | egrep ':{iface}$' || true", timeout=4)
-    conn_name = None
-    if rc == 0 and out:
-        conn_name = out.split(":")[0]
-    else:
-        # fallback choose any wifi connection or create a temp one
-        ok, conns = nmcli_list_connections()
-        if ok and conns:
-            conn_name = conns[0]["name"]
-    if not conn_name:
-        return jsonify({"success": False, "error": "no connection found for iface"}), 500
-    # set ipv4.method manual and address/gateway/dns
-    cmd = f"nmcli connection modify \"{conn_name}\" ipv4.method manual ipv4.addresses {ip} ipv4.gateway {gw}"
-    rc, out, err = run_cmd(cmd, timeout=6)
-    if rc != 0:
-        return jsonify({"success": False, "error": err or out}), 500
-    if dns:
-        dns_str = ",".join(dns)
-        rc2, out2, err2 = run_cmd(f"nmcli connection modify \"{conn_name}\" ipv4.dns \"{dns_str}\"", timeout=6)
-        if rc2 != 0:
-            logger.warning("Setting DNS failed: " + (err2 or out2))
-    # bring connection down & up
-    run_cmd(f"nmcli connection down \"{conn_name}\"", timeout=5)
-    rc3, out3, err3 = run_cmd(f"nmcli connection up \"{conn_name}\"", timeout=8)
-    if rc3 == 0:
-        return jsonify({"success": True, "message": out3})
-    else:
-        return jsonify({"success": False, "error": err3 or out3}), 500
+    return job_accepted(jobs.submit("set_static_ip", iface, static_ip_job, iface, ip, gw, dns))
 
 @app.route("/api/create_hotspot", methods=["POST"])
 @require_token
@@ -407,11 +990,7 @@ def api_create_hotspot():
     password = d.get("password")
     if not ssid or not password:
         return jsonify({"success": False, "error": "ssid and password required"}), 400
-    ok, out = nmcli_create_hotspot(ssid, password)
-    if ok:
-        return jsonify({"success": True, "message": out})
-    else:
-        return jsonify({"success": False, "error": out}), 500
+    return job_accepted(jobs.submit("create_hotspot", WIFI_IFACE, hotspot_job, ssid, password))
 
 @app.route("/api/delete_hotspot", methods=["POST"])
 @require_token
@@ -426,7 +1005,7 @@ def api_delete_hotspot():
 @require_token
 def api_profiles():
     if request.method == "GET":
-        return jsonify({"success": True, "profiles": load_profiles()})
+        return jsonify({"success": True, "profiles": profile_store.all()})
     else:
         d = request.json or {}
         name = d.get("name")
@@ -434,39 +1013,51 @@ def api_profiles():
         pwd = d.get("password")
         if not name or not ssid:
             return jsonify({"success": False, "error": "name & ssid required"}), 400
-        profs = load_profiles()
-        profs[name] = {"ssid": ssid, "password": pwd, "updated": datetime.datetime.utcnow().isoformat()}
-        save_profiles(profs)
-        return jsonify({"success": True, "profile": profs[name]})
+        try:
+            profile = profile_store.put(name, {"ssid": ssid, "password": pwd,
+                                               "updated": datetime.datetime.utcnow().isoformat()})
+        except OSError as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+        return jsonify({"success": True, "profile": profile})
 
 @app.route("/api/profiles/<name>", methods=["DELETE"])
 @require_token
 def api_profile_delete(name):
-    profs = load_profiles()
-    if name in profs:
-        del profs[name]
-        save_profiles(profs)
+    try:
+        deleted = profile_store.delete(name)
+    except OSError as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    if deleted:
         return jsonify({"success": True})
     else:
         return jsonify({"success": False, "error": "not found"}), 404
 
+@app.route("/api/auto_connect", methods=["POST"])
+@require_token
+def api_auto_connect():
+    d = request.get_json(silent=True) or {}  # Body is optional
+    snap = scan_cache.get(fresh=bool(d.get("fresh")))
+    best = profile_store.best_for(snap["networks"] or [])
+    if best is None:
+        return jsonify({"success": False, "error": "no saved profile in range"}), 404
+    name, profile, net = best
+    reply, code = job_accepted(jobs.submit("connect", WIFI_IFACE, connect_job, profile["ssid"],
+                                           profile.get("password"), name, False))
+    if code == 202:
+        reply = jsonify({**reply.get_json(), "profile": name, "signal": net.get("signal")})
+    return reply, code
+
 @app.route("/api/interfaces", methods=["GET"])
 @require_token
 def api_interfaces():
-    ok, out = get_local_interfaces()
-    if ok:
-        return jsonify({"success": True, "interfaces": out})
-    else:
-        return jsonify({"success": False, "error": out}), 500
+    return jsonify({"success": True, "interfaces": net_state.get_interfaces()})
 
 @app.route("/api/connections", methods=["GET"])
 @require_token
 def api_connections():
-    ok, out = nmcli_list_connections()
-    if ok:
-        return jsonify({"success": True, "connections": out})
-    else:
-        return jsonify({"success": False, "error": out}), 500
+    if not has_nmcli():
+        return jsonify({"success": False, "error": "nmcli not found"}), 500
+    return jsonify({"success": True, "connections": net_state.get_connections()})
 
 @app.route("/api/logs", methods=["GET"])
 @require_token
@@ -480,6 +1071,35 @@ def api_logs():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/api/jobs", methods=["GET"])
+@require_token
+def api_jobs():
+    return jsonify({"success": True, "jobs": jobs.recent()})
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+@require_token
+def api_job(job_id):
+    snap = jobs.get(job_id)
+    if snap is None:
+        return jsonify({"success": False, "error": "not found"}), 404
+    return jsonify({"success": True, "job": snap})
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+@require_token
+def api_job_events(job_id):
+    # EventSource can't set headers, so browsers pass ?token=
+    if jobs.get(job_id) is None:
+        return jsonify({"success": False, "error": "not found"}), 404
+
+    def stream():
+        for event in jobs.follow(job_id):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event['state']}\ndata: {json.dumps(event)}\n\n"
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/api/ping", methods=["GET"])
 def api_ping():
     return jsonify({"success": True, "message": "pong"})
@@ -530,8 +1150,9 @@ def cli_entry():
 # Server starter
 # -----------------------
 def start_server():
+    net_state.start()
     logger.info(f"Starting server on http://{FLASK_HOST}:{FLASK_PORT}")
-    app.run(host=FLASK_HOST, port=FLASK_PORT)
+    app.run(host=FLASK_HOST, port=FLASK_PORT, threaded=True)  # Event streams each hold a thread
 
 # -----------------------
 # Main